@@ -0,0 +1 @@
+"""Simulator and benchmarks of the Xiaomi Air Conditioning Companion component."""
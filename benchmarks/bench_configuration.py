@@ -0,0 +1,96 @@
+"""Microbenchmark of the configuration command encoding.
+
+Compares the former path, python-miio building the command next to an
+error level log line formatting the state, with the local encoder with
+and without its cache::
+
+    python -m benchmarks.bench_configuration --states 16 --number 100000
+"""
+import argparse
+import itertools
+import logging
+import timeit
+
+# pylint: disable=import-error
+from miio.airconditioningcompanion import (
+    AirConditioningCompanion,
+    FanSpeed,
+    Led,
+    OperationMode,
+    Power,
+    SwingMode
+)
+
+from custom_components.xiaomi_miio_airconditioningcompanion.protocol import (
+    encode_configuration
+)
+
+from .common import TOKEN, print_report
+
+# command template prefixes, a known one and one using the fallback template
+PREFIXES = ("0100010727", "0180111111")
+_LOGGER = logging.getLogger(__name__)
+
+
+def _states(count):
+    """Return count different states of an air conditioner."""
+    models = ["{}000000{}02".format(prefix[:2], prefix[2:]) for prefix in PREFIXES]
+    states = itertools.product(
+        models,
+        (Power.On,),
+        (OperationMode.Cool, OperationMode.Heat),
+        range(17, 31),
+        (FanSpeed.Low, FanSpeed.Auto),
+        (SwingMode.On, SwingMode.Off),
+        (Led.Off,),
+    )
+    return list(itertools.islice(states, count))
+
+
+def _miio_path(states):
+    """Return a function encoding the states like before."""
+    device = AirConditioningCompanion("127.0.0.1", TOKEN, model="lumi.acpartner.v2")
+    device.send_command = lambda command: command
+
+    def _encode():
+        for state in states:
+            _LOGGER.error("_send_configuration {} {} {} {} {}".format(*state[1:6]))
+            device.send_configuration(*state)
+
+    return _encode
+
+
+def _local_path(states, encode):
+    """Return a function encoding the states with encode."""
+    def _encode():
+        for state in states:
+            encode(*state)
+
+    return _encode
+
+
+def main():
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--states", type=int, default=16)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    # the former log line is formatted even if nothing is printed
+    logging.disable(logging.CRITICAL)
+    states = _states(args.states)
+    rounds = max(args.number // len(states), 1)
+    results = {"states": len(states), "calls": rounds * len(states)}
+    for name, function in (
+        ("miio", _miio_path(states)),
+        ("uncached", _local_path(states, encode_configuration.__wrapped__)),
+        ("cached", _local_path(states, encode_configuration)),
+    ):
+        seconds = timeit.timeit(function, number=rounds)
+        results["{}_us_per_call".format(name)] = seconds / results["calls"] * 1e6
+
+    print_report("Configuration encoding benchmark", results)
+
+
+if __name__ == "__main__":
+    main()
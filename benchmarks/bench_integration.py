@@ -0,0 +1,137 @@
+"""Throughput and latency benchmark of the integration against simulated devices.
+
+Sets up one config entry per simulated device, polls all coordinators as
+fast as possible and sends infrared commands through the
+climate_send_command service::
+
+    python -m benchmarks.bench_integration --devices 80 --duration 10
+"""
+import argparse
+import asyncio
+import time
+
+# pylint: disable=import-error
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    DATA_COORDINATOR,
+    DATA_KEY,
+    DOMAIN
+)
+
+from .common import (
+    ExecutorMonitor,
+    LoopMonitor,
+    async_create_hass,
+    async_setup_devices,
+    async_stop_hass,
+    percentiles,
+    print_report
+)
+
+COMMAND = "0180222221" + "1100191"
+
+
+async def async_poll(hass, devices, duration):
+    """Refresh all coordinators back to back for duration seconds."""
+    coordinators = [hass.data[DOMAIN][device.host][DATA_COORDINATOR] for device in devices]
+    polls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        await asyncio.gather(*[coordinator.async_refresh() for coordinator in coordinators])
+        polls += len(coordinators)
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for coordinator in coordinators if not coordinator.last_update_success)
+    return {
+        "polls": polls,
+        "polls_per_s": polls / elapsed,
+        "failed_coordinators": failed,
+    }
+
+
+async def async_send_commands(hass, rounds):
+    """Send commands to every climate entity and measure their latency."""
+    entity_ids = [entity.entity_id for entity in hass.data[DATA_KEY].values()]
+    latencies = []
+
+    async def async_send(entity_id):
+        start = time.perf_counter()
+        await hass.services.async_call(
+            DOMAIN,
+            "climate_send_command",
+            {"entity_id": entity_id, "command": COMMAND, "wait": True},
+            blocking=True,
+        )
+        latencies.append(time.perf_counter() - start)
+
+    for _ in range(rounds):
+        await asyncio.gather(*[async_send(entity_id) for entity_id in entity_ids])
+
+    start = time.perf_counter()
+    await hass.services.async_call(
+        DOMAIN,
+        "climate_send_command",
+        {"entity_id": entity_ids, "command": COMMAND, "wait": True},
+        blocking=True,
+    )
+    fleet = time.perf_counter() - start
+
+    return {
+        "commands": len(latencies),
+        **{"command_" + key: value for key, value in percentiles(latencies).items()},
+        "fleet_command_ms": fleet * 1000,
+    }
+
+
+async def async_run(args):
+    """Run the benchmark."""
+    hass = await async_create_hass()
+    loop_monitor = LoopMonitor()
+    executor_monitor = ExecutorMonitor(hass)
+    loop_monitor.start()
+    executor_monitor.start()
+    start = time.perf_counter()
+
+    devices, transports, entries = await async_setup_devices(
+        hass,
+        args.devices,
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        error_rate=args.error_rate,
+    )
+    results = {"devices": args.devices, "setup_s": time.perf_counter() - start}
+    results.update(await async_poll(hass, devices, args.duration))
+    results.update(await async_send_commands(hass, args.rounds))
+    results["status_requests"] = sum(
+        device.requests.get("get_model_and_state", 0) for device in devices
+    )
+
+    duration = time.perf_counter() - start
+    await loop_monitor.async_stop()
+    executor_monitor.stop()
+    results.update(loop_monitor.report())
+    results.update(executor_monitor.report(duration))
+
+    for entry in entries:
+        await hass.config_entries.async_unload(entry.entry_id)
+    for transport in transports:
+        transport.close()
+    await async_stop_hass(hass)
+
+    print_report("Integration benchmark", results)
+
+
+def main():
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    asyncio.run(async_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Startup time benchmark of the integration against simulated devices.
+
+Sets up one config entry per simulated device twice: a cold start without
+any cached device data, not even the model, and a warm start from the data
+the first run cached in the entries and stores::
+
+    python -m benchmarks.bench_startup --devices 80 --latency 0.2
+
+The requests sent by the setup itself and by the background tasks it
+started, like the first refresh, are counted separately.
+"""
+import argparse
+import asyncio
+import contextvars
+import time
+from unittest.mock import patch
+
+# pylint: disable=import-error
+from homeassistant.config_entries import ConfigEntry
+
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    CONF_MODEL,
+    DATA_COORDINATOR,
+    DOMAIN
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.protocol import (
+    XiaomiACPartnerClient
+)
+
+from .common import (
+    TOKEN,
+    async_create_hass,
+    async_stop_hass,
+    create_entry,
+    print_report
+)
+from .simulator import async_start_devices
+
+
+_BACKGROUND = contextvars.ContextVar("background", default=False)
+
+
+class RequestCounter:
+    """Count the requests of all clients by setup and background tasks."""
+
+    def __init__(self):
+        self.setup = 0
+        self.background = 0
+        self._send = XiaomiACPartnerClient.send
+        self._create_background_task = ConfigEntry.async_create_background_task
+
+    def patch(self):
+        """Return the patches which count the requests."""
+        counter = self
+
+        async def send(client, command, parameters=None):
+            if _BACKGROUND.get():
+                counter.background += 1
+            else:
+                counter.setup += 1
+            return await counter._send(client, command, parameters)
+
+        def async_create_background_task(entry, hass, target, name):
+            async def _async_run():
+                _BACKGROUND.set(True)
+                return await target
+            return counter._create_background_task(entry, hass, _async_run(), name)
+
+        return (
+            patch.object(XiaomiACPartnerClient, "send", send),
+            patch.object(
+                ConfigEntry, "async_create_background_task", async_create_background_task
+            ),
+        )
+
+
+def _coordinators(hass, devices):
+    """Return the coordinators of the devices which are set up."""
+    return [
+        hass.data[DOMAIN][device.host][DATA_COORDINATOR]
+        for device in devices
+        if DATA_COORDINATOR in hass.data.get(DOMAIN, {}).get(device.host, {})
+    ]
+
+
+async def async_start(hass, devices, entries, timeout):
+    """Set up all entries and wait for the first data of every coordinator."""
+    counter = RequestCounter()
+    send_patch, task_patch = counter.patch()
+    with send_patch, task_patch:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[hass.config_entries.async_setup(entry.entry_id) for entry in entries]
+        )
+        setup = time.perf_counter() - start
+        setup_requests = counter.setup
+
+        # an entry whose model was detected in the background may reload
+        while (
+            len(_coordinators(hass, devices)) < len(devices)
+            or any(coordinator.data is None for coordinator in _coordinators(hass, devices))
+        ):
+            if time.perf_counter() - start > timeout:
+                break
+            await asyncio.sleep(0.005)
+        first_data = time.perf_counter() - start
+        await hass.async_block_till_done()
+
+    coordinators = _coordinators(hass, devices)
+    return {
+        "setup_s": setup,
+        "setup_requests": setup_requests,
+        "first_data_s": first_data,
+        "background_requests": counter.background,
+        "without_data": len(devices) - sum(
+            1 for coordinator in coordinators if coordinator.data is not None
+        ),
+    }
+
+
+async def async_run(args):
+    """Run the benchmark."""
+    hass = await async_create_hass()
+    devices, transports = await async_start_devices(
+        args.devices,
+        TOKEN,
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+    )
+    entries = [create_entry(device, **{CONF_MODEL: None}) for device in devices]
+    for entry in entries:
+        entry.add_to_hass(hass)
+
+    results = {"devices": args.devices}
+    for phase in ("cold", "warm"):
+        phase_results = await async_start(hass, devices, entries, args.timeout)
+        results.update(
+            {"{}_{}".format(phase, key): value for key, value in phase_results.items()}
+        )
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+
+    for transport in transports:
+        transport.close()
+    await async_stop_hass(hass)
+
+    print_report("Startup benchmark", results)
+
+
+def main():
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    asyncio.run(async_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Shared helpers of the benchmark suite.
+
+The benchmarks run the integration inside the Home Assistant test harness
+of pytest-homeassistant-custom-component against simulated devices.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position,import-error
+from homeassistant import loader
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_test_home_assistant
+)
+
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    CONF_MODEL,
+    DOMAIN
+)
+
+from .simulator import async_start_devices
+
+TOKEN = "00112233445566778899aabbccddeeff"
+
+
+async def async_create_hass():
+    """Return a running Home Assistant instance with custom integrations enabled."""
+    hass = await async_test_home_assistant(asyncio.get_running_loop())
+    hass.config.config_dir = tempfile.mkdtemp(prefix="acpartner-bench-")
+    hass.data.pop(loader.DATA_CUSTOM_COMPONENTS, None)
+    return hass
+
+
+async def async_stop_hass(hass):
+    """Stop a Home Assistant instance created by async_create_hass."""
+    await hass.async_stop(force=True)
+
+
+def create_entry(device, **options):
+    """Return a config entry of a simulated device."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        title="AC {}".format(device.host),
+        unique_id=device.mac,
+        options={
+            "host": device.host,
+            "token": TOKEN,
+            CONF_MODEL: device.model,
+            "mac": device.mac,
+            **options,
+        },
+    )
+
+
+async def async_setup_devices(hass, count, **simulator_options):
+    """Start count simulated devices and set up a config entry for each."""
+    devices, transports = await async_start_devices(count, TOKEN, **simulator_options)
+    entries = [create_entry(device) for device in devices]
+    for entry in entries:
+        entry.add_to_hass(hass)
+    await asyncio.gather(
+        *[hass.config_entries.async_setup(entry.entry_id) for entry in entries]
+    )
+    await hass.async_block_till_done()
+    return devices, transports, entries
+
+
+class LoopMonitor:
+    """Measure how long the event loop is blocked.
+
+    A heartbeat sleeps for a short interval. Any extra delay before it is
+    woken up again is time the loop was busy with other callbacks.
+    """
+
+    def __init__(self, interval=0.005, threshold=0.01):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = []
+        self._task = None
+
+    async def _async_run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(loop.time() - start - self.interval)
+
+    def start(self):
+        """Start the heartbeat."""
+        self._task = asyncio.get_running_loop().create_task(self._async_run())
+
+    async def async_stop(self):
+        """Stop the heartbeat."""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def report(self):
+        """Return the blocking statistics."""
+        blocked = [lag for lag in self.lags if lag > self.threshold]
+        return {
+            "loop_max_lag_ms": max(self.lags, default=0) * 1000,
+            "loop_blocked_ms": sum(blocked) * 1000,
+            "loop_blocked_count": len(blocked),
+        }
+
+
+class ExecutorMonitor:
+    """Count executor jobs and the time they occupy a worker."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.jobs = 0
+        self.busy = 0.0
+        self._original = None
+
+    def start(self):
+        """Wrap async_add_executor_job of the Home Assistant instance."""
+        self._original = self.hass.async_add_executor_job
+        monitor = self
+
+        def timed(target, *args):
+            def run():
+                start = time.perf_counter()
+                try:
+                    return target(*args)
+                finally:
+                    monitor.busy += time.perf_counter() - start
+            monitor.jobs += 1
+            return monitor._original(run)
+
+        self.hass.async_add_executor_job = timed
+
+    def stop(self):
+        """Restore async_add_executor_job."""
+        self.hass.async_add_executor_job = self._original
+
+    def report(self, duration):
+        """Return the executor statistics."""
+        return {
+            "executor_jobs": self.jobs,
+            "executor_busy_s": self.busy,
+            "executor_occupancy": self.busy / duration if duration else 0.0,
+        }
+
+
+def percentiles(samples):
+    """Return p50, p90 and p99 of samples in milliseconds."""
+    if not samples:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None}
+    if len(samples) == 1:
+        value = samples[0] * 1000
+        return {"p50_ms": value, "p90_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49] * 1000,
+        "p90_ms": cuts[89] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def print_report(title, results):
+    """Print the results of a benchmark."""
+    print(title)
+    for key, value in results.items():
+        if isinstance(value, float):
+            print("  {:<26} {:.3f}".format(key, value))
+        else:
+            print("  {:<26} {}".format(key, value))
@@ -0,0 +1,291 @@
+"""Local UDP simulator of Xiaomi Air Conditioning Companions.
+
+Every simulated lumi.acpartner.v1/v2/v3 listens on its own loopback address
+(127.0.x.y) on the miIO port and answers the commands used by the
+integration. Latency, packet loss and error replies can be injected.
+
+Run a set of devices from the command line::
+
+    python -m benchmarks.simulator --devices 10 --latency 0.02 --loss 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import struct
+import time
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+_LOGGER = logging.getLogger(__name__)
+
+MIIO_PORT = 54321
+MAGIC = 0x2131
+HEADER = struct.Struct(">HHI4sI")
+HEADER_LENGTH = 32
+
+MODEL_LUMI_ACPARTNER_V1 = "lumi.acpartner.v1"
+MODEL_LUMI_ACPARTNER_V2 = "lumi.acpartner.v2"
+MODEL_LUMI_ACPARTNER_V3 = "lumi.acpartner.v3"
+MODELS = [MODEL_LUMI_ACPARTNER_V1, MODEL_LUMI_ACPARTNER_V2, MODEL_LUMI_ACPARTNER_V3]
+
+# air conditioner model code and initial state reported by get_model_and_state
+DEFAULT_AC_MODEL = "010500978022222102"
+DEFAULT_AC_STATE = "010201190280222221"
+
+LEARNED_CODE = "FE0487000071459470" + "1FFF7FFF06004227" + "4E0025002D008500AC01"
+
+
+def _md5(data: bytes) -> bytes:
+    """Return the md5 digest of data."""
+    return hashlib.md5(data).digest()  # nosec
+
+
+def address_of(index):
+    """Return the loopback address of the simulated device with the given index."""
+    return "127.0.{}.{}".format(index // 250, index % 250 + 2)
+
+
+class SimulatedACPartner(asyncio.DatagramProtocol):
+    """Server side of the miIO protocol for one acpartner."""
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, host, token, model=MODEL_LUMI_ACPARTNER_V2, latency=0.0,
+                 jitter=0.0, loss=0.0, error_rate=0.0, learn_delay=1.0):
+        self.host = host
+        self.token = token
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.error_rate = error_rate
+        self.learn_delay = learn_delay
+        self.device_id = struct.pack(">I", random.getrandbits(32))
+        self.mac = "64:09:80:{:02x}:{:02x}:{:02x}".format(*self.device_id[1:])
+        self.ac_model = DEFAULT_AC_MODEL
+        self.ac_state = DEFAULT_AC_STATE
+        self.plug_state = "on"
+        self.requests = {}
+        self._token = bytes.fromhex(token)
+        self._key = _md5(self._token)
+        self._iv = _md5(self._key + self._token)
+        self._learn_started = None
+        self._transport = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    @property
+    def is_on(self):
+        """Return True if the simulated air conditioner is on."""
+        return self.ac_state[2:3] == "1"
+
+    @property
+    def load_power(self):
+        """Return the simulated power draw in watts."""
+        if not self.is_on:
+            return 2
+        return 750 + random.randint(-50, 50)
+
+    @property
+    def properties(self):
+        """Return the values of the properties read by get_prop."""
+        return {
+            "ac_model": self.ac_model,
+            "power": "on" if self.is_on else "off",
+            "fan_mode": int(self.ac_state[4:5]),
+            "swing_mode": self.ac_state[5:6],
+            "led": self.ac_state[8:9],
+            "load_power": self.load_power,
+        }
+
+    def _encrypt(self, plaintext):
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(plaintext) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(self._key), modes.CBC(self._iv)).encryptor()
+        return encryptor.update(padded) + encryptor.finalize()
+
+    def _decrypt(self, ciphertext):
+        decryptor = Cipher(algorithms.AES(self._key), modes.CBC(self._iv)).decryptor()
+        padded = decryptor.update(ciphertext) + decryptor.finalize()
+        unpadder = padding.PKCS7(128).unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+
+    def datagram_received(self, data, addr):
+        if self.loss and random.random() < self.loss:
+            return
+        if len(data) < HEADER_LENGTH:
+            return
+
+        magic, length, _, device_id, _ = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            return
+
+        if length == HEADER_LENGTH:
+            reply = HEADER.pack(MAGIC, HEADER_LENGTH, 0, self.device_id, int(time.time()))
+            self._reply(reply + b"\xff" * 16, addr)
+            return
+
+        if device_id != self.device_id:
+            # a session of another device or of the device before a reset
+            _LOGGER.debug("%s: ignoring a stale session", self.host)
+            return
+
+        if _md5(data[:16] + self._token + data[HEADER_LENGTH:]) != data[16:HEADER_LENGTH]:
+            _LOGGER.debug("%s: checksum mismatch", self.host)
+            return
+
+        request = json.loads(self._decrypt(data[HEADER_LENGTH:length]).rstrip(b"\x00"))
+        method = request.get("method")
+        self.requests[method] = self.requests.get(method, 0) + 1
+
+        if self.error_rate and random.random() < self.error_rate:
+            payload = {
+                "id": request["id"],
+                "error": {"code": -5001, "message": "simulated error"},
+            }
+        else:
+            try:
+                result = self.handle(method, request.get("params", []))
+                payload = {"id": request["id"], "result": result}
+            except (KeyError, ValueError):
+                payload = {
+                    "id": request["id"],
+                    "error": {"code": -32601, "message": "Method not found."},
+                }
+
+        data = self._encrypt(json.dumps(payload).encode("utf-8") + b"\x00")
+        header = HEADER.pack(
+            MAGIC, HEADER_LENGTH + len(data), 0, self.device_id, int(time.time())
+        )
+        self._reply(header + _md5(header + self._token + data) + data, addr)
+
+    def _reply(self, data, addr):
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._sendto, data, addr)
+        else:
+            self._sendto(data, addr)
+
+    def _sendto(self, data, addr):
+        if self._transport is not None:
+            self._transport.sendto(data, addr)
+
+    def handle(self, method, params):
+        """Return the result of a miIO command."""
+        # pylint: disable=too-many-return-statements
+        if method == "miIO.info":
+            return {
+                "model": self.model,
+                "fw_ver": "1.4.4_152",
+                "hw_ver": "MW300",
+                "mac": self.mac,
+                "token": self.token,
+                "ap": {"ssid": "simulator", "bssid": "00:00:00:00:00:00", "rssi": -40},
+                "netif": {"localIp": self.host, "mask": "255.0.0.0", "gw": "127.0.0.1"},
+            }
+        if method == "get_model_and_state":
+            return [self.ac_model, self.ac_state, str(self.load_power)]
+        if method == "get_prop":
+            return [self.properties[prop] for prop in params]
+        if method == "get_device_prop" and self.model == MODEL_LUMI_ACPARTNER_V3:
+            return [self.plug_state]
+        if method == "set_power":
+            self._set_power(params[0] == "on")
+            return ["ok"]
+        if method == "send_cmd":
+            self._apply_configuration(params[0])
+            return ["ok"]
+        if method == "send_ir_code":
+            return ["ok"]
+        if method == "start_ir_learn":
+            self._learn_started = time.monotonic()
+            return ["ok"]
+        if method == "get_ir_learn_result":
+            if (
+                self._learn_started is not None
+                and time.monotonic() - self._learn_started >= self.learn_delay
+            ):
+                return [LEARNED_CODE]
+            return ["(null)"]
+        if method == "end_ir_learn":
+            self._learn_started = None
+            return ["ok"]
+        raise KeyError(method)
+
+    def _set_power(self, power):
+        self.ac_state = self.ac_state[:2] + ("1" if power else "0") + self.ac_state[3:]
+
+    def _apply_configuration(self, command):
+        """Update the state from a configuration command (01 prefix)."""
+        if not command.startswith("01") or len(command) < 16:
+            return
+        # prefix (10) + [po][mo][wi][sw][tt][tt]
+        settings = command[10:16]
+        try:
+            int(settings, 16)
+        except ValueError:
+            return
+        self.ac_state = self.ac_state[:2] + settings + self.ac_state[8:]
+
+
+async def async_start_devices(count, token, models=None, port=MIIO_PORT, **kwargs):
+    """Start count simulated devices and return them with their transports."""
+    loop = asyncio.get_running_loop()
+    models = models or MODELS
+    devices = []
+    transports = []
+    for index in range(count):
+        host = address_of(index)
+        device = SimulatedACPartner(host, token, models[index % len(models)], **kwargs)
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda device=device: device, local_addr=(host, port)
+        )
+        devices.append(device)
+        transports.append(transport)
+    return devices, transports
+
+
+async def _async_main(args):
+    devices, transports = await async_start_devices(
+        args.devices,
+        args.token,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        error_rate=args.error_rate,
+    )
+    for device in devices:
+        print("{} {} {}".format(device.host, device.model, device.mac))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+def main():
+    """Run simulated devices until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--token", default="00112233445566778899aabbccddeeff")
+    parser.add_argument("--port", type=int, default=MIIO_PORT)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
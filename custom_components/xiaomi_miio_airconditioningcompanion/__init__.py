@@ -3,27 +3,55 @@
 import logging
 
 import homeassistant.helpers.config_validation as cv
+from homeassistant.components.climate import DOMAIN as CLIMATE_DOMAIN
 from homeassistant.const import (
     CONF_HOST,
+    CONF_SCAN_INTERVAL,
     CONF_TOKEN
 )
+from homeassistant.components.xiaomi_miio.const import CONF_FLOW_TYPE
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import PlatformNotReady
-from miio import (  # pylint: disable=import-error
-    AirConditioningCompanion,
-    AirConditioningCompanionV3,
-    DeviceException
-)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.util.dt import utcnow
+from miio import DeviceException  # pylint: disable=import-error
 
 from .const import (
+    ATTR_AIR_CONDITION_MODEL,
+    CACHED_OPTIONS,
+    CONF_AC_MODEL,
+    CONF_FAST_SCAN_INTERVAL,
+    CONF_FIRMWARE_VERSION,
+    CONF_GROUP,
+    CONF_HARDWARE_VERSION,
+    CONF_INFO_UPDATED,
+    CONF_MAX_SCAN_INTERVAL,
     CONF_MODEL,
+    CONF_POWER_WINDOWS,
+    DATA_CODES,
+    DATA_COORDINATOR,
+    DATA_DEVICE,
     DATA_KEY,
+    DATA_OPTIONS,
+    DATA_PIPELINE,
+    DATA_SCHEDULES,
+    DATA_SESSIONS,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_POWER_WINDOWS,
+    DEFAULT_SCAN_INTERVAL,
+    DEVICE_INFO_MAX_AGE,
     DOMAIN,
     DOMAINS,
-    MODELS_MIIO,
-    MODEL_LUMI_ACPARTNER_V3
+    MODEL_LUMI_ACPARTNER_V2,
+    MODELS_MIIO
 )
+from .coordinator import XiaomiACPartnerCoordinator
+from .pipeline import XiaomiACPartnerSendPipeline
+from .power_stats import parse_power_windows
+from .protocol import XiaomiACPartnerClient
+from .scheduler import XiaomiACPartnerScheduler
+from .storage import XiaomiACPartnerCodeStore, XiaomiACPartnerSessionStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,17 +61,109 @@ async def async_setup(hass: HomeAssistant, hass_config: dict):
     return True
 
 
+def _without_cached_options(options):
+    """Return the options which require a reload on change."""
+    return {
+        key: value for key, value in options.items() if key not in CACHED_OPTIONS
+    }
+
+
 async def async_update_options(hass: HomeAssistant, entry: ConfigEntry):
     """ Update Optioins if available """
+    host_data = hass.data.get(DOMAIN, {}).get(entry.options.get(CONF_HOST))
+    if host_data is not None and (
+        _without_cached_options(host_data[DATA_OPTIONS])
+        == _without_cached_options(entry.options)
+    ):
+        # only the cached device data changed
+        return
+
     await hass.config_entries.async_reload(entry.entry_id)
 
 
+def _cache_device_info(hass: HomeAssistant, entry: ConfigEntry, device_info):
+    """Store the model, firmware and hardware version on the config entry."""
+    options = dict(entry.options)
+    options.update(
+        {
+            CONF_MODEL: device_info.model,
+            CONF_FIRMWARE_VERSION: device_info.firmware_version,
+            CONF_HARDWARE_VERSION: device_info.hardware_version,
+            CONF_INFO_UPDATED: utcnow().timestamp(),
+        }
+    )
+    hass.config_entries.async_update_entry(entry, options=options)
+
+
+async def async_refresh_device_info(hass: HomeAssistant, entry: ConfigEntry, acpartner):
+    """Refresh the cached device info and the device registry entry."""
+    try:
+        device_info = await acpartner.info()
+    except DeviceException as ex:
+        _LOGGER.debug("Unable to refresh the device info: %s", ex)
+        return
+
+    if device_info.model != acpartner.model:
+        _LOGGER.info(
+            "%s %s %s detected",
+            device_info.model,
+            device_info.firmware_version,
+            device_info.hardware_version,
+        )
+    _cache_device_info(hass, entry, device_info)
+
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_device(identifiers={(DOMAIN, entry.unique_id)})
+    if device is not None:
+        device_registry.async_update_device(
+            device.id,
+            sw_version=device_info.firmware_version,
+            hw_version=device_info.hardware_version,
+        )
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """ check unload integration """
-    return all([
+    if entry.options.get(CONF_FLOW_TYPE) == CONF_GROUP:
+        unload_ok = await hass.config_entries.async_forward_entry_unload(
+            entry, CLIMATE_DOMAIN)
+        if unload_ok:
+            hass.data.get(DATA_KEY, {}).pop(entry.entry_id, None)
+        return unload_ok
+
+    unload_ok = all([
         await hass.config_entries.async_forward_entry_unload(entry, domain)
         for domain in DOMAINS
     ])
+    if unload_ok:
+        host_data = hass.data[DOMAIN].pop(entry.options[CONF_HOST], None)
+        if host_data and DATA_COORDINATOR in host_data:
+            await host_data[DATA_COORDINATOR].async_shutdown()
+        if host_data and DATA_PIPELINE in host_data:
+            await host_data[DATA_PIPELINE].async_stop()
+        if host_data and DATA_DEVICE in host_data:
+            hass.data[DATA_SESSIONS].async_remove(host_data[DATA_DEVICE])
+            await host_data[DATA_DEVICE].async_close()
+    return unload_ok
+
+
+async def _async_get_store(hass: HomeAssistant, key, store_class):
+    """Return a store shared by all entries, loaded on first use."""
+    if key not in hass.data:
+        hass.data[key] = store_class(hass)
+    store = hass.data[key]
+    await store.async_load()
+    return store
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Remove the learned codes and the schedules of a removed device."""
+    if entry.options.get(CONF_FLOW_TYPE) == CONF_GROUP:
+        return
+    codes = await _async_get_store(hass, DATA_CODES, XiaomiACPartnerCodeStore)
+    codes.async_remove_device(entry.unique_id)
+    scheduler = await _async_get_store(hass, DATA_SCHEDULES, XiaomiACPartnerScheduler)
+    scheduler.async_remove_device(entry.unique_id)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
@@ -58,6 +178,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     if not entry.update_listeners:
         entry.add_update_listener(async_update_options)
 
+    if entry.options.get(CONF_FLOW_TYPE) == CONF_GROUP:
+        # a group only drives the climate entities of other entries
+        await hass.config_entries.async_forward_entry_setups(entry, [CLIMATE_DOMAIN])
+        return True
+
     if entry.data.get(CONF_HOST, None):
         host = entry.data[CONF_HOST]
         token = entry.data[CONF_TOKEN]
@@ -74,37 +199,83 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {}
 
+    host_data = hass.data[DOMAIN][host] = {DATA_OPTIONS: dict(entry.options)}
+
+    acpartner = XiaomiACPartnerClient(host, token, model)
+    sessions = await _async_get_store(hass, DATA_SESSIONS, XiaomiACPartnerSessionStore)
+    sessions.async_restore(acpartner)
+
     if model is None:
-        try:
-            miio_device = AirConditioningCompanion(host, token)
-            device_info = await hass.async_add_executor_job(miio_device.info)
-            model = device_info.model
-            _LOGGER.info(
-                "%s %s %s detected",
-                model,
-                device_info.firmware_version,
-                device_info.hardware_version,
-            )
-        except DeviceException as ex:
-            raise PlatformNotReady from ex
-
-    if model in MODELS_MIIO:
-        if model == MODEL_LUMI_ACPARTNER_V3:
-            acpartner = AirConditioningCompanionV3(host, token)
-        else:
-            acpartner = AirConditioningCompanion(host, token)
-    else:
+        # start as the default model, the device info is refreshed in the
+        # background and another model reloads the entry
+        model = acpartner.model = MODEL_LUMI_ACPARTNER_V2
+        options = dict(entry.options)
+        options[CONF_MODEL] = model
+        hass.config_entries.async_update_entry(entry, options=options)
+        host_data[DATA_OPTIONS] = dict(entry.options)
+
+    if model not in MODELS_MIIO:
         _LOGGER.error(
             "Unsupported device found! Please create an issue at "
             "https://github.com/rytilahti/python-miio/issues "
             "and provide the following data: %s",
             model,
         )
+        sessions.async_remove(acpartner)
+        await acpartner.async_close()
+        hass.data[DOMAIN].pop(host, None)
         return False
 
-    hass.data[DOMAIN][host] = acpartner
+    coordinator = XiaomiACPartnerCoordinator(
+        hass,
+        host,
+        acpartner,
+        scan_interval=entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+        fast_scan_interval=entry.options.get(
+            CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL),
+        max_scan_interval=entry.options.get(
+            CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL),
+        power_windows=parse_power_windows(
+            entry.options.get(CONF_POWER_WINDOWS, DEFAULT_POWER_WINDOWS)),
+    )
+
+    @callback
+    def _async_cache_ac_model():
+        """Store the air conditioner model code for the next start."""
+        ac_model = (coordinator.data or {}).get(ATTR_AIR_CONDITION_MODEL)
+        if ac_model and ac_model != entry.options.get(CONF_AC_MODEL):
+            options = dict(entry.options)
+            options[CONF_AC_MODEL] = ac_model
+            hass.config_entries.async_update_entry(entry, options=options)
+
+    entry.async_on_unload(coordinator.async_add_listener(_async_cache_ac_model))
+
+    host_data[DATA_DEVICE] = acpartner
+    host_data[DATA_COORDINATOR] = coordinator
+    host_data[DATA_PIPELINE] = XiaomiACPartnerSendPipeline(hass, host)
+    await _async_get_store(hass, DATA_CODES, XiaomiACPartnerCodeStore)
+    await _async_get_store(hass, DATA_SCHEDULES, XiaomiACPartnerScheduler)
 
     # init setup for each supported domains
     await hass.config_entries.async_forward_entry_setups(entry, DOMAINS)
 
+    # the entities start from the cached entry data, the device is contacted
+    # in the background
+    entry.async_create_background_task(
+        hass, coordinator.async_refresh(), "{} first refresh".format(host)
+    )
+
+    # another model reloads the entry, so it must be set up by now
+    info_updated = entry.options.get(CONF_INFO_UPDATED)
+    if (
+        entry.options.get(CONF_FIRMWARE_VERSION) is None
+        or info_updated is None
+        or utcnow().timestamp() - info_updated > DEVICE_INFO_MAX_AGE.total_seconds()
+    ):
+        entry.async_create_background_task(
+            hass,
+            async_refresh_device_info(hass, entry, acpartner),
+            "{} device info".format(host),
+        )
+
     return True
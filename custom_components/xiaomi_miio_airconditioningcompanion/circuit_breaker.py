@@ -0,0 +1,93 @@
+"""Circuit breaker of the Xiaomi Air Conditioning Companion component."""
+import random
+from time import monotonic
+
+from .const import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_MAX_OPEN_TIME,
+    CIRCUIT_OPEN_TIME
+)
+
+
+class XiaomiACPartnerCircuitBreaker:
+    """Stop sending requests to a device which does not reply.
+
+    The circuit opens after a number of requests in a row got no reply.
+    While open, requests are rejected at once. After a randomized delay a
+    single probe request is let through: a reply closes the circuit,
+    otherwise it opens again for a longer delay. Failures of requests
+    which were in flight when the circuit opened are ignored.
+    """
+
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, open_time=CIRCUIT_OPEN_TIME,
+                 max_open_time=CIRCUIT_MAX_OPEN_TIME):
+        self._threshold = threshold
+        self._open_time = open_time
+        self._max_open_time = max_open_time
+        self.failures = 0
+        self._openings = 0
+        self._retry_at = None
+        self._probe_started = None
+        # called when the circuit opens
+        self.open_listener = None
+
+    @property
+    def is_open(self):
+        """Return True while requests are rejected."""
+        return self._retry_at is not None
+
+    @property
+    def retry_in(self):
+        """Return the seconds until the next probe or None while closed."""
+        if self._retry_at is None:
+            return None
+        return max(self._retry_at - monotonic(), 0)
+
+    def allow_request(self):
+        """Return True if a request may be sent."""
+        if self._retry_at is None:
+            return True
+        now = monotonic()
+        if now < self._retry_at:
+            return False
+        if (
+            self._probe_started is not None
+            and now - self._probe_started < self._max_open_time
+        ):
+            # a probe is in flight, unless it was cancelled without a result
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self):
+        """Close the circuit after a reply of the device."""
+        self.failures = 0
+        self._openings = 0
+        self._retry_at = None
+        self._probe_started = None
+
+    def record_failure(self):
+        """Count a request without reply and open the circuit if needed."""
+        if self._retry_at is not None and self._probe_started is None:
+            # sent before the circuit opened, the outage is already counted
+            return
+
+        self.failures += 1
+        self._probe_started = None
+        if self._retry_at is None and self.failures < self._threshold:
+            return
+
+        delay = min(self._open_time * 2 ** self._openings, self._max_open_time)
+        self._openings += 1
+        # spread the probes of devices which failed at the same time
+        self._retry_at = monotonic() + random.uniform(delay / 2, delay)  # nosec
+        if self.open_listener is not None:
+            self.open_listener()
+
+    def as_dict(self):
+        """Return the state of the circuit."""
+        return {
+            "open": self.is_open,
+            "failures": self.failures,
+            "retry_in": self.retry_in,
+        }
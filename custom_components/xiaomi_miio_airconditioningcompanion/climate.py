@@ -4,19 +4,21 @@ Support for Xiaomi Air Conditioner Companion (AC Partner)
 import asyncio
 import enum
 import logging
-import time
-from datetime import timedelta
+import math
 from functools import partial
+from time import monotonic
 import voluptuous as vol
 
 import homeassistant.helpers.config_validation as cv
 from homeassistant import config_entries
-from homeassistant.core import callback, HomeAssistant
+from homeassistant.core import callback, Event, HomeAssistant, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.event import async_track_state_change
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.util.dt import utcnow
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.climate import ClimateEntity, ClimateEntityFeature
 from homeassistant.components.climate.const import (
     ATTR_HVAC_MODE,
@@ -38,13 +40,16 @@ from homeassistant.const import (
     ATTR_TEMPERATURE,
     CONF_HOST,
     CONF_MAC,
+    CONF_NAME,
     CONF_TIMEOUT,
     STATE_ON,
     STATE_OFF,
     STATE_UNKNOWN,
     STATE_UNAVAILABLE,
-    PRECISION_WHOLE
+    PRECISION_WHOLE,
+    WEEKDAYS
 )
+from homeassistant.components.xiaomi_miio.const import CONF_FLOW_TYPE
 
 from miio import DeviceException
 from miio.airconditioningcompanion import (
@@ -55,30 +60,71 @@ from miio.airconditioningcompanion import (
 )
 from miio.airconditioningcompanion import OperationMode as MiioOperationMode
 
+from .climate_group import XiaomiACPartnerGroupClimate
 from .const import (
+    CONF_AC_MODEL,
+    CONF_GROUP,
+    CONF_FIRMWARE_VERSION,
+    CONF_HARDWARE_VERSION,
     ATTR_AIR_CONDITION_MODEL,
     ATTR_SWING_MODE,
     ATTR_FAN_MODE,
     ATTR_LOAD_POWER,
     ATTR_LED,
+    ATTR_OPERATION_MODE,
+    ATTR_POWER,
+    ATTR_TARGET_TEMPERATURE,
     CONF_COMMAND,
+    CONF_CONTROL,
+    CONF_CONTROL_HYSTERESIS,
+    CONF_CONTROL_MAX_COMMANDS,
+    CONF_CONTROL_MIN_INTERVAL,
     CONF_MODEL,
+    CONF_HUMIDITY_DEADBAND,
     CONF_HUMIDITY_SENSOR,
+    CONF_SENSOR_UPDATE_INTERVAL,
+    CONF_TEMPERATURE_DEADBAND,
     CONF_TEMPERATURE_SENSOR,
     CONF_POWER_SENSOR,
+    CONF_MAX_PARALLEL,
     CONF_MAX_TEMP,
     CONF_MIN_TEMP,
+    CONF_OPTIMISTIC,
+    CONF_SEND_DEBOUNCE,
     CONF_SLOT,
+    CONF_WAIT,
+    CONTROL_OFF,
+    CONTROL_PI,
+    DATA_CODES,
+    DATA_SCHEDULES,
+    DATA_COORDINATOR,
+    DATA_DEVICE,
     DATA_KEY,
+    DATA_PIPELINE,
+    DEFAULT_CONTROL,
+    DEFAULT_CONTROL_HYSTERESIS,
+    DEFAULT_CONTROL_MAX_COMMANDS,
+    DEFAULT_CONTROL_MIN_INTERVAL,
     DEFAULT_DELAY,
+    DEFAULT_HUMIDITY_DEADBAND,
+    DEFAULT_MAX_PARALLEL,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_SEND_DEBOUNCE,
+    DEFAULT_SENSOR_UPDATE_INTERVAL,
     DEFAULT_TARGET_TEMPERATURE,
+    DEFAULT_TEMPERATURE_DEADBAND,
     DEFAULT_TIMEOUT,
     DEFAULT_SLOT,
     DOMAIN,
     MODELS_MIIO,
+    PROPERTY_STATUS,
     TARGET_TEMPERATURE_STEP,
+    VERIFY_DELAY,
     ACPARTNER_PROPS
 )
+from .control import XiaomiACPartnerThermostat
+from .learning import async_learn_code
+from .scheduler import ATTR_SCHEDULE_ID, ATTR_TIME, ATTR_WEEKDAYS
 
 SUPPORT_FLAGS = (
     ClimateEntityFeature.TARGET_TEMPERATURE |
@@ -88,9 +134,23 @@ SUPPORT_FLAGS = (
 
 
 SERVICE_LEARN_COMMAND = "climate_learn_command"
+SERVICE_CANCEL_LEARN_COMMAND = "climate_cancel_learn_command"
 SERVICE_SEND_COMMAND = "climate_send_command"
-
-SERVICE_SCHEMA = vol.Schema({vol.Required(ATTR_ENTITY_ID): cv.entity_ids})
+SERVICE_DELETE_COMMAND = "climate_delete_command"
+SERVICE_SET_STATE = "climate_set_state"
+SERVICE_ADD_SCHEDULE = "climate_add_schedule"
+SERVICE_REMOVE_SCHEDULE = "climate_remove_schedule"
+SERVICE_LIST_SCHEDULES = "climate_list_schedules"
+CONF_FORCE = "force"
+
+SERVICE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Optional(CONF_MAX_PARALLEL, default=DEFAULT_MAX_PARALLEL): vol.All(
+            int, vol.Range(min=1)
+        ),
+    }
+)
 
 SERVICE_SCHEMA_LEARN_COMMAND = SERVICE_SCHEMA.extend(
     {
@@ -100,14 +160,53 @@ SERVICE_SCHEMA_LEARN_COMMAND = SERVICE_SCHEMA.extend(
         vol.Optional(CONF_SLOT, default=DEFAULT_SLOT): vol.All(
             int, vol.Range(min=2, max=1000000)
         ),
+        vol.Optional(CONF_NAME): cv.string,
     }
 )
 
 SERVICE_SCHEMA_SEND_COMMAND = SERVICE_SCHEMA.extend(
     {
-        vol.Required(CONF_COMMAND, default=""): cv.string,
+        vol.Required(CONF_COMMAND, default=""): vol.All(cv.ensure_list, [cv.string]),
         vol.Optional(ATTR_NUM_REPEATS, default=DEFAULT_NUM_REPEATS): cv.positive_int,
         vol.Optional(ATTR_DELAY_SECS, default=DEFAULT_DELAY_SECS): vol.Coerce(float),
+        vol.Optional(CONF_WAIT, default=False): cv.boolean,
+    }
+)
+
+SERVICE_SCHEMA_DELETE_COMMAND = SERVICE_SCHEMA.extend(
+    {
+        vol.Required(CONF_COMMAND): vol.All(cv.ensure_list, [cv.string]),
+    }
+)
+
+SERVICE_SCHEMA_SET_STATE = SERVICE_SCHEMA.extend(
+    {
+        vol.Optional(ATTR_HVAC_MODE): vol.In(
+            [HVAC_MODE_AUTO, HVAC_MODE_COOL, HVAC_MODE_DRY, HVAC_MODE_FAN_ONLY,
+             HVAC_MODE_HEAT, HVAC_MODE_OFF]
+        ),
+        vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+        vol.Optional(ATTR_FAN_MODE): vol.In([speed.name.lower() for speed in FanSpeed]),
+        vol.Optional(ATTR_SWING_MODE): vol.In(
+            [mode.name.lower() for mode in SwingMode if "Unknown" not in mode.name]
+        ),
+        vol.Optional(CONF_FORCE, default=False): cv.boolean,
+    }
+)
+
+SERVICE_SCHEMA_ADD_SCHEDULE = vol.All(
+    SERVICE_SCHEMA_SET_STATE.extend(
+        {
+            vol.Required(ATTR_TIME): cv.time,
+            vol.Optional(ATTR_WEEKDAYS, default=list(WEEKDAYS)): cv.weekdays,
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_HVAC_MODE, ATTR_TEMPERATURE, ATTR_FAN_MODE, ATTR_SWING_MODE),
+)
+
+SERVICE_SCHEMA_REMOVE_SCHEDULE = SERVICE_SCHEMA.extend(
+    {
+        vol.Required(ATTR_SCHEDULE_ID): cv.string,
     }
 )
 
@@ -115,15 +214,43 @@ SERVICE_TO_METHOD = {
     SERVICE_LEARN_COMMAND: {
         "method": "async_learn_command",
         "schema": SERVICE_SCHEMA_LEARN_COMMAND,
+        "supports_response": SupportsResponse.OPTIONAL,
+    },
+    SERVICE_CANCEL_LEARN_COMMAND: {
+        "method": "async_cancel_learn_command",
     },
     SERVICE_SEND_COMMAND: {
         "method": "async_send_command",
         "schema": SERVICE_SCHEMA_SEND_COMMAND,
     },
+    SERVICE_DELETE_COMMAND: {
+        "method": "async_delete_command",
+        "schema": SERVICE_SCHEMA_DELETE_COMMAND,
+    },
+    SERVICE_SET_STATE: {
+        "method": "async_send_state",
+        "schema": SERVICE_SCHEMA_SET_STATE,
+    },
+    SERVICE_ADD_SCHEDULE: {
+        "method": "async_add_schedule",
+        "schema": SERVICE_SCHEMA_ADD_SCHEDULE,
+        "supports_response": SupportsResponse.OPTIONAL,
+    },
+    SERVICE_REMOVE_SCHEDULE: {
+        "method": "async_remove_schedule",
+        "schema": SERVICE_SCHEMA_REMOVE_SCHEDULE,
+    },
+    SERVICE_LIST_SCHEDULES: {
+        "method": "async_list_schedules",
+        "supports_response": SupportsResponse.ONLY,
+    },
 }
 
 _LOGGER = logging.getLogger(__name__)
 
+# operation modes in which the controller shifts the setpoint
+CONTROLLED_MODES = [HVAC_MODE_AUTO, HVAC_MODE_COOL, HVAC_MODE_HEAT]
+
 class OperationMode(enum.Enum):
     Heat = HVAC_MODE_HEAT
     Cool = HVAC_MODE_COOL
@@ -132,6 +259,12 @@ class OperationMode(enum.Enum):
     Ventilate = HVAC_MODE_FAN_ONLY
     Off = HVAC_MODE_OFF
 
+def _within_deadband(value, current, deadband):
+    """Return True if value does not differ enough from current to be shown."""
+    if current is None:
+        return False
+    return value == current or abs(value - current) < deadband
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: config_entries.ConfigEntry,
@@ -139,33 +272,44 @@ async def async_setup_entry(
 ) -> None:
     """Set up the Xiaomi Air Conditioning Companion platform."""
 
-    host = entry.options[CONF_HOST]
-    model = entry.options[CONF_MODEL]
-    name = entry.title
-    unique_id = entry.unique_id
-
-    acpartner = hass.data[DOMAIN][host]
+    if entry.options.get(CONF_FLOW_TYPE) == CONF_GROUP:
+        group = XiaomiACPartnerGroupClimate(hass, entry)
+        hass.data.setdefault(DATA_KEY, {})[entry.entry_id] = group
+        async_add_entities([group])
+    else:
+        host = entry.options[CONF_HOST]
+        model = entry.options[CONF_MODEL]
+        name = entry.title
+        unique_id = entry.unique_id
+
+        acpartner = hass.data[DOMAIN][host][DATA_DEVICE]
+        coordinator = hass.data[DOMAIN][host][DATA_COORDINATOR]
+        pipeline = hass.data[DOMAIN][host][DATA_PIPELINE]
+        codes = hass.data[DATA_CODES]
+        scheduler = hass.data[DATA_SCHEDULES]
 
-    try:
-        entities = []
-
-        if model in MODELS_MIIO:
-            air_conditioning_companion = XiaomiACPartnerClimate(hass, entry.options, name, unique_id, acpartner)
-            entities.extend(
-                [air_conditioning_companion]
-            )
-            hass.data[DATA_KEY][host] = air_conditioning_companion
-
-        async_add_entities(entities)
-    except AttributeError as ex:
-        _LOGGER.error(ex)
+        try:
+            entities = []
+
+            if model in MODELS_MIIO:
+                air_conditioning_companion = XiaomiACPartnerClimate(
+                    hass, coordinator, entry.options, name, unique_id, acpartner, pipeline,
+                    codes, scheduler)
+                entities.extend(
+                    [air_conditioning_companion]
+                )
+                hass.data[DATA_KEY][host] = air_conditioning_companion
 
+            async_add_entities(entities)
+        except AttributeError as ex:
+            _LOGGER.error(ex)
 
     async def async_service_handler(service):
         """Map services to methods on XiaomiAirConditioningCompanion."""
         method = SERVICE_TO_METHOD.get(service.service)
         params = {
-            key: value for key, value in service.data.items() if key != ATTR_ENTITY_ID
+            key: value for key, value in service.data.items()
+            if key not in (ATTR_ENTITY_ID, CONF_MAX_PARALLEL)
         }
         entity_ids = service.data.get(ATTR_ENTITY_ID)
         if entity_ids:
@@ -175,33 +319,60 @@ async def async_setup_entry(
                 if device.entity_id in entity_ids
             ]
         else:
-            devices = hass.data[DATA_KEY].values()
+            # the members of groups are called directly
+            devices = [
+                device for device in hass.data[DATA_KEY].values()
+                if not isinstance(device, XiaomiACPartnerGroupClimate)
+            ]
 
-        update_tasks = []
-        for device in devices:
-            if not hasattr(device, method["method"]):
-                continue
-            await getattr(device, method["method"])(**params)
-            # update_tasks.append(device.async_update_ha_state(True))
-            await device.async_update_ha_state(True)
+        devices = [device for device in devices if hasattr(device, method["method"])]
+        semaphore = asyncio.Semaphore(
+            service.data.get(CONF_MAX_PARALLEL, DEFAULT_MAX_PARALLEL))
 
-        # if update_tasks:
-            # await asyncio.wait(update_tasks)
+        async def async_call_device(device):
+            """Call the service method of one device."""
+            async with semaphore:
+                result = await getattr(device, method["method"])(**params)
+            device.async_write_ha_state()
+            return result
 
+        results = await asyncio.gather(
+            *[async_call_device(device) for device in devices],
+            return_exceptions=True
+        )
+        response = {}
+        for device, result in zip(devices, results):
+            if isinstance(result, Exception):
+                _LOGGER.error(
+                    "Calling %s of %s failed: %s", service.service, device.entity_id, result
+                )
+            elif result is not None:
+                response[device.entity_id] = result
+        return response
 
     for service in SERVICE_TO_METHOD:
         schema = SERVICE_TO_METHOD[service].get("schema", SERVICE_SCHEMA)
         hass.services.async_register(
-            DOMAIN, service, async_service_handler, schema=schema
+            DOMAIN, service, async_service_handler, schema=schema,
+            supports_response=SERVICE_TO_METHOD[service].get(
+                "supports_response", SupportsResponse.NONE),
         )
 
 
-class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
+class XiaomiACPartnerClimate(CoordinatorEntity, ClimateEntity, RestoreEntity):
     """Implementation of a Xiaomi Air Conditioning Companion sensor."""
 
-    def __init__(self, hass, config, name, unique_id, acpartner):
+    # pylint: disable=too-many-arguments
+    def __init__(self, hass, coordinator, config, name, unique_id, acpartner, pipeline,
+                 codes, scheduler):
+        super().__init__(coordinator, context=(PROPERTY_STATUS,))
         self.hass = hass
         self._acpartner = acpartner
+        self._pipeline = pipeline
+        self._codes = codes
+        self._scheduler = scheduler
+        self._learn_task = None
+        self._config = config
         self._unique_id = unique_id
         self._name = name
         self._model = config.get(CONF_MODEL)
@@ -213,7 +384,7 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
         self._power_sensor = config.get(CONF_POWER_SENSOR)
       #  self._power_sensor_restore_state = config.get(CONF_POWER_SENSOR_RESTORE_STATE)
         self._power_sensor_restore_state = False
-        self._air_condition_model = None
+        self._air_condition_model = config.get(CONF_AC_MODEL)
 
         self._available = False
         self._state = None
@@ -256,7 +427,53 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
             self._support_swing = True
 
         self._temp_lock = asyncio.Lock()
+        self._control_lock = asyncio.Lock()
+        send_debounce = config.get(CONF_SEND_DEBOUNCE, DEFAULT_SEND_DEBOUNCE)
+        self._send_debouncer = None
+        if send_debounce:
+            self._send_debouncer = Debouncer(
+                hass,
+                _LOGGER,
+                cooldown=send_debounce,
+                immediate=False,
+                function=self._async_send_desired_state,
+            )
+        self._temperature_deadband = config.get(
+            CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND)
+        self._humidity_deadband = config.get(
+            CONF_HUMIDITY_DEADBAND, DEFAULT_HUMIDITY_DEADBAND)
+        sensor_update_interval = config.get(
+            CONF_SENSOR_UPDATE_INTERVAL, DEFAULT_SENSOR_UPDATE_INTERVAL)
+        self._sensor_debouncer = None
+        if sensor_update_interval:
+            # the first change is written at once, later changes once per interval
+            self._sensor_debouncer = Debouncer(
+                hass,
+                _LOGGER,
+                cooldown=sensor_update_interval,
+                immediate=True,
+                function=self.async_write_ha_state,
+            )
         self._on_by_remote = False
+        self._optimistic = config.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC)
+        # monotonic time until which polled states do not override the
+        # optimistic state, None if no command awaits verification
+        self._verify_after = None
+        # last state reported by or successfully sent to the device as
+        # (True, hvac_mode, target_temperature, fan_mode, swing_mode) or (False,)
+        self._device_state = None
+        self._force_send = False
+        self._skipped_sends = 0
+        self._controller = None
+        control = config.get(CONF_CONTROL, DEFAULT_CONTROL)
+        if control != CONTROL_OFF and self._temperature_sensor:
+            self._controller = XiaomiACPartnerThermostat(
+                control,
+                config.get(CONF_CONTROL_HYSTERESIS, DEFAULT_CONTROL_HYSTERESIS),
+                config.get(CONF_CONTROL_MIN_INTERVAL, DEFAULT_CONTROL_MIN_INTERVAL),
+                config.get(CONF_CONTROL_MAX_COMMANDS, DEFAULT_CONTROL_MAX_COMMANDS),
+            )
+        self._unsub_control = None
 
         self._attr_unique_id = self._unique_id
 
@@ -276,26 +493,52 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
                 self._last_on_operation = last_state.attributes['last_on_operation']
                 self._state = self._last_on_operation
 
+        self._async_update_from_data(self.coordinator.data)
+
         if self._temperature_sensor:
-            async_track_state_change(self.hass, self._temperature_sensor,
-                                        self._async_temp_sensor_changed)
+            self.async_on_remove(
+                async_track_state_change_event(
+                    self.hass, [self._temperature_sensor], self._async_temp_sensor_changed
+                )
+            )
 
             temp_sensor_state = self.hass.states.get(self._temperature_sensor)
             if temp_sensor_state and temp_sensor_state.state != STATE_UNKNOWN:
                 self._async_update_temp(temp_sensor_state)
 
         if self._humidity_sensor:
-            async_track_state_change(self.hass, self._humidity_sensor,
-                                        self._async_humidity_sensor_changed)
+            self.async_on_remove(
+                async_track_state_change_event(
+                    self.hass, [self._humidity_sensor], self._async_humidity_sensor_changed
+                )
+            )
 
             humidity_sensor_state = self.hass.states.get(self._humidity_sensor)
             if humidity_sensor_state and humidity_sensor_state.state != STATE_UNKNOWN:
                 self._async_update_humidity(humidity_sensor_state)
 
         if self._power_sensor:
-            async_track_state_change(
-                self.hass, self._power_sensor,
-                self._async_power_sensor_changed)
+            self.async_on_remove(
+                async_track_state_change_event(
+                    self.hass, [self._power_sensor], self._async_power_sensor_changed
+                )
+            )
+
+        self._scheduler.async_register(self._unique_id, self)
+
+    async def async_will_remove_from_hass(self):
+        """Cancel a pending configuration send and a running learn session."""
+        await super().async_will_remove_from_hass()
+        self._scheduler.async_unregister(self._unique_id)
+        if self._unsub_control is not None:
+            self._unsub_control()
+            self._unsub_control = None
+        if self._send_debouncer is not None:
+            self._send_debouncer.async_cancel()
+        if self._sensor_debouncer is not None:
+            self._sensor_debouncer.async_cancel()
+        if self._learn_task is not None:
+            self._learn_task.cancel()
 
     @property
     def unique_id(self):
@@ -395,19 +638,21 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
         return {
             'last_on_operation': self._last_on_operation,
             'data': self._slot,
+            'commands': self._codes.async_names(self._unique_id),
+            'skipped_sends': self._skipped_sends,
+            'setpoint_offset': self._setpoint_offset(),
         }
 
     @property
     def device_info(self):
         """Return the device info."""
-        info = self._acpartner.info()
         device_info = {
             "identifiers": {(DOMAIN, self._unique_id)},
             "manufacturer": (self._model or "Xiaomi").split(".", 1)[0].capitalize(),
             "name": self._name,
             "model": self._model,
-            "sw_version": info.firmware_version,
-            "hw_version": info.hardware_version
+            "sw_version": self._config.get(CONF_FIRMWARE_VERSION),
+            "hw_version": self._config.get(CONF_HARDWARE_VERSION)
         }
 
         if self._mac is not None:
@@ -417,82 +662,84 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
 
 
     async def _send_configuration(self):
-        _LOGGER.error("_send_configuration {} {} {} {} {}".format(
-            Power(int(self._state)),
-            MiioOperationMode[OperationMode(self._hvac_mode).name]
-                if self._state else MiioOperationMode[OperationMode(self._last_on_operation).name],
-            self._target_temperature if isinstance(
-                self._target_temperature, int) else int(self._target_temperature),
-            FanSpeed[self._current_fan_mode.capitalize()],
-            SwingMode[self._current_swing_mode.capitalize()]
-        ))
-        if self._air_condition_model is not None:
-            try:
-                await self._try_command(
-                    "Sending new air conditioner configuration failed.",
-                    self._acpartner.send_configuration,
-                    self._air_condition_model,
-                    Power(int(self._state)),
-                    MiioOperationMode[OperationMode(self._hvac_mode).name]
-                        if self._state else MiioOperationMode[OperationMode(self._last_on_operation).name],
-                    self._target_temperature if isinstance(
-                        self._target_temperature, int) else int(self._target_temperature),
-                    FanSpeed[self._current_fan_mode.capitalize()],
-                    SwingMode[self._current_swing_mode.capitalize()],
-                    Led.Off,
-                )
-            except ValueError:
-                _LOGGER.error(
-                    "send configuration with invalid value"
-                )
-        else:
+        """Send the desired state as configuration command."""
+        if self._air_condition_model is None:
             _LOGGER.error(
                 "Model number of the air condition unknown. "
                 "Configuration cannot be sent."
             )
+            return False
 
-    async def async_set_temperature(self, **kwargs):
-        """Set new target temperatures."""
-        hvac_mode = kwargs.get(ATTR_HVAC_MODE)
-        temperature = kwargs.get(ATTR_TEMPERATURE)
+        try:
+            configuration = (
+                Power(int(self._state)),
+                MiioOperationMode[OperationMode(self._hvac_mode).name]
+                    if self._state else MiioOperationMode[OperationMode(self._last_on_operation).name],
+                self._sent_temperature(),
+                FanSpeed[self._current_fan_mode.capitalize()],
+                SwingMode[self._current_swing_mode.capitalize()],
+                Led.Off,
+            )
+        except ValueError:
+            _LOGGER.error(
+                "send configuration with invalid value"
+            )
+            return False
 
-        if temperature is None:
-            return
+        _LOGGER.debug("Sending configuration %s", configuration)
+        return await self._try_command(
+            "Sending new air conditioner configuration failed.",
+            self._acpartner.send_configuration,
+            self._air_condition_model,
+            *configuration,
+        )
+
+    def _setpoint_offset(self):
+        """Return the shift of the setpoint by the controller in degrees."""
+        if self._controller is None or self._hvac_mode not in CONTROLLED_MODES:
+            return 0
+        return self._controller.offset
 
+    def _sent_temperature(self):
+        """Return the target temperature to send, shifted by the controller."""
+        temperature = int(self._target_temperature) + self._setpoint_offset()
+        return min(max(temperature, int(self._min_temperature)), int(self._max_temperature))
+
+    def _set_target_temperature(self, temperature):
+        """Set the target temperature, return False if it is out of range."""
         if temperature < self._min_temperature or temperature > self._max_temperature:
             _LOGGER.warning('The temperature value is out of min/max range')
-            return
+            return False
 
         if self._precision == PRECISION_WHOLE:
             self._target_temperature = round(temperature)
         else:
             self._target_temperature = round(temperature, 1)
+        return True
+
+    async def async_set_temperature(self, **kwargs):
+        """Set new target temperatures."""
+        hvac_mode = kwargs.get(ATTR_HVAC_MODE)
+        temperature = kwargs.get(ATTR_TEMPERATURE)
+
+        if temperature is None or not self._set_target_temperature(temperature):
+            return
 
         if hvac_mode:
             await self.async_set_hvac_mode(hvac_mode)
             return
 
         if not self._hvac_mode.lower() == HVAC_MODE_OFF:
-            await self._send_configuration()
+            await self._async_schedule_configuration()
 
         self.async_write_ha_state()
 
     async def async_set_hvac_mode(self, hvac_mode):
         """Set operation mode."""
         self._hvac_mode = hvac_mode
+        self._state = hvac_mode != OperationMode.Off.value
 
-        if hvac_mode == OperationMode.Off.value:
-            result = await self._try_command(
-                "Turning the miio device off failed.", self._acpartner.off
-            )
-            if result:
-                self._state = False
-                self._hvac_mode = HVAC_MODE_OFF
-                await self._send_configuration()
-        else:
-            self._state = True
-            await self._send_configuration()
-
+        await self._async_schedule_configuration()
         self.async_write_ha_state()
 
     async def async_set_fan_mode(self, fan_mode):
@@ -500,7 +747,7 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
         self._current_fan_mode = fan_mode
 
         if not self._hvac_mode.lower() == HVAC_MODE_OFF:
-            await self._try_command("Turning the acpartner on failed.", self._acpartner.off)
+            await self._async_schedule_configuration()
 
         self.async_write_ha_state()
 
@@ -509,105 +756,368 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
         self._current_swing_mode = swing_mode
 
         if not self._hvac_mode.lower() == HVAC_MODE_OFF:
-            await self._try_command("Turning the acpartner on failed.", self._acpartner.on)
+            await self._async_schedule_configuration()
+
+        self.async_write_ha_state()
+
+    def _apply_state(self, hvac_mode, temperature, fan_mode, swing_mode, force):
+        """Take over the given attributes, return True if they have to be sent."""
+        if temperature is not None and not self._set_target_temperature(temperature):
+            return False
+        if fan_mode is not None:
+            self._current_fan_mode = fan_mode
+        if swing_mode is not None:
+            self._current_swing_mode = swing_mode
+        if hvac_mode is not None:
+            self._hvac_mode = hvac_mode
+            self._state = hvac_mode != OperationMode.Off.value
+
+        if hvac_mode is not None or not self._hvac_mode.lower() == HVAC_MODE_OFF:
+            self._force_send = self._force_send or force
+            return True
+        return False
+
+    # pylint: disable=too-many-arguments
+    async def async_send_state(self, hvac_mode=None, temperature=None, fan_mode=None,
+                               swing_mode=None, force=False):
+        """Set several attributes and send them with a single configuration command.
+
+        The command is sent at once without coalescing and is skipped if the
+        device already reports the state, unless force is set. It returns
+        after the command has been sent, so callers can limit the number of
+        concurrent sends.
+        """
+        if self._apply_state(hvac_mode, temperature, fan_mode, swing_mode, force):
+            if self._optimistic:
+                # hold the optimistic state until the command has been sent
+                self._verify_after = math.inf
+            await self._async_send_desired_state()
+
         self.async_write_ha_state()
 
+    async def async_send_turn_on(self):
+        """Turn on in the last operation mode and send it at once."""
+        await self.async_send_state(hvac_mode=self._on_operation())
+
+    async def async_run_schedule(self, schedule):
+        """Send the state of a schedule which fired without delay."""
+        await self.async_send_state(
+            schedule.get(ATTR_HVAC_MODE),
+            schedule.get(ATTR_TEMPERATURE),
+            schedule.get(ATTR_FAN_MODE),
+            schedule.get(ATTR_SWING_MODE),
+            schedule.get(CONF_FORCE, False),
+        )
+
+    async def async_add_schedule(self, **kwargs):
+        """Add a schedule which sets the state at a time on some weekdays."""
+        schedule = dict(kwargs)
+        schedule[ATTR_TIME] = schedule[ATTR_TIME].isoformat()
+        schedule_id = self._scheduler.async_add(self._unique_id, schedule)
+        return {ATTR_SCHEDULE_ID: schedule_id}
+
+    async def async_remove_schedule(self, schedule_id):
+        """Remove a schedule by id."""
+        if not self._scheduler.async_delete(self._unique_id, schedule_id):
+            _LOGGER.warning("%s has no schedule with id %s", self._name, schedule_id)
+
+    async def async_list_schedules(self):
+        """Return the schedules by id."""
+        return dict(self._scheduler.async_schedules(self._unique_id))
+
+    async def _async_schedule_configuration(self):
+        """Send the desired state, coalescing bursts of changes."""
+        if self._optimistic:
+            # hold the optimistic state until the command has been sent
+            self._verify_after = math.inf
+        if self._send_debouncer is None:
+            await self._async_send_desired_state()
+        else:
+            await self._send_debouncer.async_call()
+
+    def _desired_device_state(self):
+        """Return the desired state in the form of _device_state."""
+        if not self._state:
+            return (False,)
+        return (
+            True,
+            self._hvac_mode,
+            self._sent_temperature(),
+            self._current_fan_mode,
+            self._current_swing_mode,
+        )
+
+    async def _async_send_desired_state(self):
+        """Send the final desired state to the air conditioner.
+
+        Nothing is sent if the device already reports the desired state.
+        Return True if the state was sent.
+        """
+        force, self._force_send = self._force_send, False
+        try:
+            desired = self._desired_device_state()
+            if not force and desired == self._device_state:
+                self._skipped_sends += 1
+                _LOGGER.debug("%s is already in state %s, not sending", self._name, desired)
+                return False
+
+            if not self._state:
+                result = await self._try_command(
+                    "Turning the miio device off failed.", self._acpartner.off
+                )
+                if not result:
+                    return False
+
+            if not await self._send_configuration():
+                return False
+            self._device_state = desired
+            return True
+        finally:
+            if self._verify_after == math.inf:
+                # nothing was sent, the next poll shows the device state
+                self._verify_after = None
+
     async def async_turn_off(self):
         """Turn off."""
         self._state = False
         await self.async_set_hvac_mode(HVAC_MODE_OFF)
 
+    def _on_operation(self):
+        """Return the operation mode to turn on in."""
+        if self._last_on_operation is not None:
+            return self._last_on_operation
+        return self._operation_modes[1]
+
     async def async_turn_on(self):
         """Turn on."""
-        if self._last_on_operation is not None:
-            await self.async_set_hvac_mode(self._last_on_operation)
-        else:
-            await self.async_set_hvac_mode(self._operation_modes[1])
+        await self.async_set_hvac_mode(self._on_operation())
         self._state = True
 
     async def _try_command(self, mask_error, func, *args, **kwargs):
         """Call a plug command handling error messages."""
         try:
-            result = await self.hass.async_add_executor_job(
-                partial(func, *args, **kwargs)
-            )
+            result = await func(*args, **kwargs)
 
             _LOGGER.debug("Response received from climate: %s", result)
 
+            self._async_command_sent()
             return True if "ok" in result else False
         except DeviceException as exc:
+            self._verify_after = None
             if self._available:
                 _LOGGER.error(mask_error, exc)
                 self._available = False
 
             return False
 
-    async def async_update(self):
-        """Fetch state from the device."""
-        state = None
-        try:
-            state = await self.hass.async_add_executor_job(self._acpartner.status)
-            _LOGGER.debug("Got new state: %s", state)
+    @callback
+    def _async_command_sent(self):
+        """Arrange for the state to be read back after a command."""
+        if not self._optimistic:
+            self.coordinator.async_note_activity()
+            return
 
-        except DeviceException as ex:
-            if self._available:
-                self._available = False
-                _LOGGER.debug("Got exception while fetching the state: %s", ex)
+        self._verify_after = monotonic() + VERIFY_DELAY
+        self.coordinator.async_verify_later(VERIFY_DELAY)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._async_update_from_data(self.coordinator.data)
+        self.async_write_ha_state()
+        if self._controller is not None and self._controller.mode == CONTROL_PI:
+            # the integral advances with every poll, not only with new readings
+            self.hass.async_create_task(self._async_control())
+
+    @callback
+    def _async_update_from_data(self, data):
+        """Update the climate state from the decoded device status."""
+        if not data:
+            return
 
         self._available = True
-        if state:
-            model = "Unspecified"
-            if state.air_condition_model:
-                model = state.air_condition_model.hex()
-            self._state_attrs.update(
-                {
-                    ATTR_AIR_CONDITION_MODEL: model,
-                    ATTR_LOAD_POWER: state.load_power,
-                    ATTR_TEMPERATURE: state.target_temperature,
-                    ATTR_SWING_MODE: state.swing_mode.name.lower(),
-                    ATTR_FAN_MODE: state.fan_speed.name.lower(),
-                    ATTR_HVAC_MODE: state.mode.name.lower() if self._state else "off",
-                    ATTR_LED: state.led,
-                }
-            )
-        if state.mode:
-            self._last_on_operation = OperationMode[state.mode.name].value
+        is_on = data[ATTR_POWER] != "off"
+        operation_mode = data[ATTR_OPERATION_MODE]
+        if data[ATTR_AIR_CONDITION_MODEL]:
+            self._air_condition_model = data[ATTR_AIR_CONDITION_MODEL]
+        self._state_attrs.update(
+            {
+                ATTR_AIR_CONDITION_MODEL: data[ATTR_AIR_CONDITION_MODEL] or "Unspecified",
+                ATTR_LOAD_POWER: data[ATTR_LOAD_POWER],
+                ATTR_TEMPERATURE: data[ATTR_TARGET_TEMPERATURE],
+                ATTR_SWING_MODE: data[ATTR_SWING_MODE],
+                ATTR_FAN_MODE: data[ATTR_FAN_MODE],
+                ATTR_HVAC_MODE: operation_mode.lower() if is_on and operation_mode else "off",
+                ATTR_LED: data[ATTR_LED],
+            }
+        )
+        if self._verify_after is not None:
+            if not self.coordinator.verifying and monotonic() < self._verify_after:
+                # the device may not have applied the last command yet
+                return
+            self._verify_after = None
+            self._async_reconcile(data, is_on)
+
+        if operation_mode:
+            self._last_on_operation = OperationMode[operation_mode].value
         else:
             self._last_on_operation = "off"
-        if state and state.power == "off":
+        self._device_state = self._reported_device_state(data, is_on)
+        if not is_on:
             self._hvac_mode = HVAC_MODE_OFF
             self._state = False
         else:
             self._hvac_mode = self._last_on_operation
             self._state = True
-        if self._air_condition_model is None and state:
-            self._air_condition_model = state.air_condition_model.hex()
 
+    def _reported_device_state(self, data, is_on):
+        """Return the state reported by the device in the form of _device_state."""
+        operation_mode = data[ATTR_OPERATION_MODE]
+        if not is_on:
+            return (False,)
+        if not operation_mode or data[ATTR_TARGET_TEMPERATURE] is None:
+            return None
+        return (
+            True,
+            OperationMode[operation_mode].value,
+            data[ATTR_TARGET_TEMPERATURE],
+            data[ATTR_FAN_MODE],
+            data[ATTR_SWING_MODE],
+        )
 
-    async def _async_temp_sensor_changed(self, entity_id, old_state, new_state):
+    @callback
+    def _async_reconcile(self, data, is_on):
+        """Adopt the verified device state where it differs from the optimistic one."""
+        operation_mode = data[ATTR_OPERATION_MODE]
+        desired = {ATTR_HVAC_MODE: self._hvac_mode}
+        reported = {
+            ATTR_HVAC_MODE: OperationMode[operation_mode].value
+            if is_on and operation_mode else HVAC_MODE_OFF
+        }
+        if is_on and self._state:
+            desired.update(
+                {
+                    ATTR_TARGET_TEMPERATURE: self._sent_temperature(),
+                    ATTR_FAN_MODE: self._current_fan_mode,
+                    ATTR_SWING_MODE: self._current_swing_mode,
+                }
+            )
+            reported.update(
+                {
+                    ATTR_TARGET_TEMPERATURE: data[ATTR_TARGET_TEMPERATURE],
+                    ATTR_FAN_MODE: data[ATTR_FAN_MODE]
+                        if data[ATTR_FAN_MODE] in self._fan_modes else None,
+                    ATTR_SWING_MODE: data[ATTR_SWING_MODE]
+                        if data[ATTR_SWING_MODE] in self._swing_modes else None,
+                }
+            )
+
+        mismatch = {
+            key: value for key, value in reported.items()
+            if value is not None and value != desired[key]
+        }
+        if not mismatch:
+            return
+
+        _LOGGER.warning(
+            "%s did not apply the last command, the device reports %s instead of %s",
+            self._name,
+            mismatch,
+            {key: desired[key] for key in mismatch},
+        )
+        if ATTR_TARGET_TEMPERATURE in mismatch:
+            self._target_temperature = (
+                mismatch[ATTR_TARGET_TEMPERATURE] - self._setpoint_offset())
+        if ATTR_FAN_MODE in mismatch:
+            self._current_fan_mode = mismatch[ATTR_FAN_MODE]
+        if ATTR_SWING_MODE in mismatch:
+            self._current_swing_mode = mismatch[ATTR_SWING_MODE]
+
+    async def _async_temp_sensor_changed(self, event: Event):
         """Handle temperature sensor changes."""
+        new_state = event.data.get("new_state")
         if new_state is None:
             return
 
-        self._async_update_temp(new_state)
-        self.async_write_ha_state()
+        if self._async_update_temp(new_state):
+            await self._async_write_sensor_state()
+            await self._async_control()
+
+    async def _async_control(self):
+        """Send the setpoint again if the controller shifts it.
+
+        A shift which exceeds the command budget is sent once the budget
+        allows, unless the reading changes in the meantime. Only a sent
+        shift counts against the budget, a failed one is tried again.
+        """
+        if self._controller is None:
+            return
 
-    async def _async_humidity_sensor_changed(self, entity_id, old_state, new_state):
+        # readings and polls run the controller one at a time
+        async with self._control_lock:
+            if (
+                not self._state
+                or self._hvac_mode not in CONTROLLED_MODES
+                or self._current_temperature is None
+            ):
+                self._controller.reset()
+                return
+
+            offset = self._controller.update(self._target_temperature, self._current_temperature)
+            if offset == self._controller.offset:
+                return
+            retry_in = self._controller.retry_in()
+            if retry_in:
+                if self._unsub_control is None:
+                    self._unsub_control = async_call_later(
+                        self.hass, retry_in, self._async_control_later)
+                return
+
+            _LOGGER.debug(
+                "%s shifts the setpoint by %s at %s", self._name, offset, self._current_temperature)
+            previous = self._controller.offset
+            # the desired state carries the new offset
+            self._controller.offset = offset
+            if await self._async_send_desired_state():
+                self._controller.record_command(offset)
+            elif self._desired_device_state() != self._device_state:
+                # nothing reached the device
+                self._controller.offset = previous
+            self.async_write_ha_state()
+
+    async def _async_control_later(self, _now):
+        """Run the controller once the command budget allows."""
+        self._unsub_control = None
+        await self._async_control()
+
+    async def _async_humidity_sensor_changed(self, event: Event):
         """Handle humidity sensor changes."""
+        new_state = event.data.get("new_state")
         if new_state is None:
             return
 
-        self._async_update_humidity(new_state)
-        self.async_write_ha_state()
+        if self._async_update_humidity(new_state):
+            await self._async_write_sensor_state()
+
+    async def _async_write_sensor_state(self):
+        """Write the state for sensor changes, at most once per interval."""
+        if self._sensor_debouncer is None:
+            self.async_write_ha_state()
+        else:
+            await self._sensor_debouncer.async_call()
 
-    async def _async_power_sensor_changed(self, entity_id, old_state, new_state):
+    async def _async_power_sensor_changed(self, event: Event):
         """Handle power sensor changes."""
+        old_state = event.data.get("old_state")
+        new_state = event.data.get("new_state")
         if new_state is None:
             return
 
         if old_state is not None and new_state.state == old_state.state:
             return
 
+        self.coordinator.async_note_activity()
+
         if new_state.state == STATE_ON and self._hvac_mode == HVAC_MODE_OFF:
             self._on_by_remote = True
             if self._power_sensor_restore_state == True and self._last_on_operation is not None:
@@ -625,86 +1135,136 @@ class XiaomiACPartnerClimate(ClimateEntity, RestoreEntity):
 
     @callback
     def _async_update_temp(self, state):
-        """Update thermostat with latest state from temperature sensor."""
+        """Update thermostat with latest state from temperature sensor.
+
+        Return True if the temperature changed by at least the deadband.
+        """
         try:
             if state.state != STATE_UNKNOWN and state.state != STATE_UNAVAILABLE:
-                self._current_temperature = float(state.state)
+                temperature = float(state.state)
+                if _within_deadband(
+                    temperature, self._current_temperature, self._temperature_deadband
+                ):
+                    return False
+                self._current_temperature = temperature
+                return True
         except ValueError as ex:
             _LOGGER.error("Unable to update from temperature sensor: %s", ex)
+        return False
 
     @callback
     def _async_update_humidity(self, state):
-        """Update thermostat with latest state from humidity sensor."""
+        """Update thermostat with latest state from humidity sensor.
+
+        Return True if the humidity changed by at least the deadband.
+        """
         try:
             if state.state != STATE_UNKNOWN and state.state != STATE_UNAVAILABLE:
-                self._current_humidity = float(state.state)
+                humidity = float(state.state)
+                if _within_deadband(
+                    humidity, self._current_humidity, self._humidity_deadband
+                ):
+                    return False
+                self._current_humidity = humidity
+                return True
         except ValueError as ex:
             _LOGGER.error("Unable to update from humidity sensor: %s", ex)
+        return False
 
-    async def async_learn_command(self, slot, timeout):
-        """Learn a infrared command."""
-        await self.hass.async_add_job(self._acpartner.learn, slot)
+    async def async_learn_command(self, slot, timeout, name=None):
+        """Learn a infrared command, store it under name and return it."""
+        if name is None:
+            name = "slot_{}".format(slot)
 
-        _LOGGER.info("Press the key you want Home Assistant to learn")
-        start_time = utcnow()
-        while (utcnow() - start_time) < timedelta(seconds=timeout):
-            message = await self.hass.async_add_job(self._acpartner.learn_result)
-            # FIXME: Improve python-miio here?
-            message = message[0]
-            _LOGGER.debug("Message received from device: '%s'", message)
-            if message.startswith("FE"):
-                log_msg = "Received command is: {}".format(message)
-                _LOGGER.info(log_msg)
-                self.hass.components.persistent_notification.async_create(
-                    log_msg, title="Xiaomi Miio Remote"
-                )
-                await self.hass.async_add_job(self._acpartner.learn_stop, slot)
-                return
+        if self._learn_task is not None:
+            raise HomeAssistantError("{} is already learning".format(self._name))
 
-            await asyncio.sleep(1)
+        _LOGGER.info("Press the key you want Home Assistant to learn")
+        task = self._learn_task = self.hass.async_create_task(
+            async_learn_code(self._acpartner, slot, timeout)
+        )
+        try:
+            await asyncio.wait({task})
+        finally:
+            if not task.done():
+                task.cancel()
+            self._learn_task = None
+
+        if task.cancelled():
+            _LOGGER.info("Learning of %s cancelled", name)
+            return None
+
+        message = task.result()
+        if message is None:
+            _LOGGER.error("Timeout. No infrared command captured")
+            self.hass.components.persistent_notification.async_create(
+                "Timeout. No infrared command captured", title="Xiaomi Miio Remote"
+            )
+            return None
 
-        await self.hass.async_add_job(self._acpartner.learn_stop, slot)
-        _LOGGER.error("Timeout. No infrared command captured")
+        self._codes.async_set(self._unique_id, name, message)
+        self.async_write_ha_state()
+        log_msg = "Received command '{}' is: {}".format(name, message)
+        _LOGGER.info(log_msg)
         self.hass.components.persistent_notification.async_create(
-            "Timeout. No infrared command captured", title="Xiaomi Miio Remote"
+            log_msg, title="Xiaomi Miio Remote"
         )
+        return {CONF_NAME: name, CONF_COMMAND: message}
+
+    async def async_cancel_learn_command(self):
+        """Cancel a running learn session."""
+        if self._learn_task is not None:
+            self._learn_task.cancel()
 
     async def async_send_command(self, command, **kwargs):
-        """Send a infrared command."""
+        """Send a sequence of infrared commands."""
         repeat = kwargs[ATTR_NUM_REPEATS]
         delay = kwargs[ATTR_DELAY_SECS]
-        first_command = True
-        _LOGGER.error(command)
+        wait = kwargs.get(CONF_WAIT, False)
+        _LOGGER.debug("Sending IR commands: %s", command)
 
-        if not command:
+        if isinstance(command, str):
+            command = [command]
+
+        if not command or not all(command):
             _LOGGER.error("No IR command.")
             return
 
-        for _ in range(repeat):
-            if not first_command:
-                time.sleep(delay)
-
-            if command.startswith("01"):
-                await self._try_command(
+        sends = []
+        for code in command:
+            code = self._codes.async_get(self._unique_id, code) or code
+            if code.startswith("01"):
+                sends.append(partial(
+                    self._try_command,
                     "Sending new air conditioner configuration failed.",
                     self._acpartner.send_command,
-                    command,
-                )
-            elif command.startswith("FE"):
-                if self._air_condition_model is not None:
-                    # Learned infrared commands has the prefix 'FE'
-                    await self._try_command(
-                        "Sending custom infrared command failed.",
-                        self._acpartner.send_ir_code,
-                        self._air_condition_model,
-                        command,
-                    )
-                else:
+                    code,
+                ))
+            elif code.startswith("FE"):
+                if self._air_condition_model is None:
                     _LOGGER.error(
                         "Model number of the air condition unknown. "
                         "IR command cannot be sent."
                     )
+                    return
+                # Learned infrared commands has the prefix 'FE'
+                sends.append(partial(
+                    self._try_command,
+                    "Sending custom infrared command failed.",
+                    self._acpartner.send_ir_code,
+                    self._air_condition_model,
+                    code,
+                ))
             else:
-                _LOGGER.error("Invalid IR command.")
+                _LOGGER.error("Invalid IR command or unknown command name: %s", code)
+                return
+
+        result = self._pipeline.async_enqueue(sends, repeat, delay)
+        if wait:
+            await result
 
-            first_command = False
+    async def async_delete_command(self, command):
+        """Delete learned infrared commands by name."""
+        for name in command:
+            if not self._codes.async_delete(self._unique_id, name):
+                _LOGGER.warning("%s has no learned command named %s", self._name, name)
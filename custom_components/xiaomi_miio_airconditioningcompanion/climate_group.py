@@ -0,0 +1,192 @@
+"""Group climate entity of the Xiaomi Air Conditioning Companion component."""
+import asyncio
+import logging
+from collections import Counter
+from statistics import mean
+
+from homeassistant.components.climate import (
+    ATTR_CURRENT_TEMPERATURE,
+    ATTR_FAN_MODE,
+    ATTR_FAN_MODES,
+    ATTR_HVAC_MODE,
+    ATTR_MAX_TEMP,
+    ATTR_MIN_TEMP,
+    ATTR_SWING_MODE,
+    ATTR_SWING_MODES,
+    ClimateEntity,
+    ClimateEntityFeature,
+    HVACMode
+)
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    ATTR_TEMPERATURE,
+    CONF_ENTITIES,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN
+)
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import CONF_MAX_PARALLEL, DATA_KEY, DEFAULT_MAX_PARALLEL
+
+_LOGGER = logging.getLogger(__name__)
+
+SUPPORT_FLAGS = (
+    ClimateEntityFeature.TARGET_TEMPERATURE |
+    ClimateEntityFeature.FAN_MODE |
+    ClimateEntityFeature.SWING_MODE
+)
+DEFAULT_MIN_TEMP = 16
+DEFAULT_MAX_TEMP = 32
+
+
+def _majority(values):
+    """Return the most common value or None."""
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return Counter(values).most_common(1)[0][0]
+
+
+def _mean(values):
+    """Return the mean of the numeric values or None."""
+    values = [value for value in values if isinstance(value, (int, float))]
+    if not values:
+        return None
+    return round(mean(values), 1)
+
+
+class XiaomiACPartnerGroupClimate(ClimateEntity):
+    """Climate entity which drives a group of air conditioning companions.
+
+    Changes are sent to all members concurrently, at most max_parallel at
+    a time, each as one configuration command. The state is aggregated from
+    the cached states of the members: the majority mode of the members
+    which are on, the mean target temperature and on if any member is on.
+    """
+
+    _attr_should_poll = False
+    _attr_supported_features = SUPPORT_FLAGS
+
+    def __init__(self, hass: HomeAssistant, entry):
+        self.hass = hass
+        self._attr_name = entry.title
+        self._attr_unique_id = entry.entry_id
+        self._members = list(entry.options.get(CONF_ENTITIES, []))
+        self._max_parallel = entry.options.get(CONF_MAX_PARALLEL, DEFAULT_MAX_PARALLEL)
+        self._attr_temperature_unit = hass.config.units.temperature_unit
+        self._attr_target_temperature_step = 1
+        self._attr_hvac_modes = [HVACMode.OFF]
+        self._attr_hvac_mode = HVACMode.OFF
+        self._attr_fan_modes = []
+        self._attr_swing_modes = []
+        self._attr_available = False
+        self._attr_extra_state_attributes = {ATTR_ENTITY_ID: self._members}
+
+    async def async_added_to_hass(self):
+        """Follow the state changes of the members."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_state_change_event(
+                self.hass, self._members, self._async_member_changed
+            )
+        )
+        self._async_update_from_members()
+
+    @callback
+    def _async_member_changed(self, _event: Event):
+        """Update the aggregated state after a member changed."""
+        self._async_update_from_members()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_update_from_members(self):
+        """Aggregate the cached states of the members."""
+        states = [
+            state for state in (
+                self.hass.states.get(entity_id) for entity_id in self._members
+            )
+            if state is not None and state.state not in (STATE_UNAVAILABLE, STATE_UNKNOWN)
+        ]
+        self._attr_available = bool(states)
+        if not states:
+            return
+
+        on_states = [state for state in states if state.state != HVACMode.OFF]
+        self._attr_hvac_mode = _majority(state.state for state in on_states) or HVACMode.OFF
+        self._attr_target_temperature = _mean(
+            state.attributes.get(ATTR_TEMPERATURE) for state in states)
+        self._attr_current_temperature = _mean(
+            state.attributes.get(ATTR_CURRENT_TEMPERATURE) for state in states)
+        self._attr_fan_mode = _majority(state.attributes.get(ATTR_FAN_MODE) for state in states)
+        self._attr_swing_mode = _majority(
+            state.attributes.get(ATTR_SWING_MODE) for state in states)
+
+        first = states[0].attributes
+        self._attr_hvac_modes = first.get("hvac_modes", self._attr_hvac_modes)
+        self._attr_fan_modes = first.get(ATTR_FAN_MODES, self._attr_fan_modes)
+        self._attr_swing_modes = first.get(ATTR_SWING_MODES, self._attr_swing_modes)
+        self._attr_min_temp = max(
+            state.attributes.get(ATTR_MIN_TEMP, DEFAULT_MIN_TEMP) for state in states)
+        self._attr_max_temp = min(
+            state.attributes.get(ATTR_MAX_TEMP, DEFAULT_MAX_TEMP) for state in states)
+
+    def _member_entities(self):
+        """Return the loaded climate entities of the members."""
+        return [
+            entity for entity in self.hass.data.get(DATA_KEY, {}).values()
+            if getattr(entity, "entity_id", None) in self._members
+        ]
+
+    async def _async_call_members(self, method, **kwargs):
+        """Call a method of all members concurrently, max_parallel at a time."""
+        semaphore = asyncio.Semaphore(self._max_parallel)
+        members = [
+            member for member in self._member_entities() if hasattr(member, method)
+        ]
+
+        async def async_call_member(member):
+            """Call the method of one member."""
+            async with semaphore:
+                await getattr(member, method)(**kwargs)
+
+        results = await asyncio.gather(
+            *[async_call_member(member) for member in members],
+            return_exceptions=True,
+        )
+        for member, result in zip(members, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Calling %s of %s failed: %s", method, member.entity_id, result)
+
+    async def async_send_state(self, **kwargs):
+        """Send a state to all members, see XiaomiACPartnerClimate.async_send_state."""
+        await self._async_call_members("async_send_state", **kwargs)
+
+    async def async_set_temperature(self, **kwargs):
+        """Set the target temperature of all members."""
+        state = {}
+        if kwargs.get(ATTR_TEMPERATURE) is not None:
+            state[ATTR_TEMPERATURE] = kwargs[ATTR_TEMPERATURE]
+        if kwargs.get(ATTR_HVAC_MODE) is not None:
+            state[ATTR_HVAC_MODE] = kwargs[ATTR_HVAC_MODE]
+        await self.async_send_state(**state)
+
+    async def async_set_hvac_mode(self, hvac_mode):
+        """Set the operation mode of all members."""
+        await self.async_send_state(hvac_mode=hvac_mode)
+
+    async def async_set_fan_mode(self, fan_mode):
+        """Set the fan mode of all members."""
+        await self.async_send_state(fan_mode=fan_mode)
+
+    async def async_set_swing_mode(self, swing_mode):
+        """Set the swing mode of all members."""
+        await self.async_send_state(swing_mode=swing_mode)
+
+    async def async_turn_on(self):
+        """Turn on all members in their last operation mode."""
+        await self._async_call_members("async_send_turn_on")
+
+    async def async_turn_off(self):
+        """Turn off all members."""
+        await self.async_send_state(hvac_mode=HVACMode.OFF)
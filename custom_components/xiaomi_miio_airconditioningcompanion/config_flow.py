@@ -9,8 +9,15 @@ import voluptuous as vol
 from homeassistant import config_entries, core
 
 from homeassistant.config_entries import SOURCE_REAUTH, ConfigEntry
-from homeassistant.const import CONF_NAME, CONF_HOST, CONF_TOKEN
+from homeassistant.const import (
+    CONF_ENTITIES,
+    CONF_NAME,
+    CONF_HOST,
+    CONF_SCAN_INTERVAL,
+    CONF_TOKEN
+)
 from homeassistant.core import callback
+from homeassistant.helpers import selector
 from homeassistant.helpers.device_registry import format_mac
 
 from homeassistant.components.xiaomi_miio.const import (
@@ -30,13 +37,47 @@ from homeassistant.components.xiaomi_miio.const import (
 from homeassistant.components.xiaomi_miio.device import ConnectXiaomiDevice
 
 from .const import (
+    CONF_AC_MODEL,
+    CONF_CONTROL,
+    CONF_CONTROL_HYSTERESIS,
+    CONF_CONTROL_MAX_COMMANDS,
+    CONF_CONTROL_MIN_INTERVAL,
+    CONF_FAST_SCAN_INTERVAL,
+    CONF_FIRMWARE_VERSION,
+    CONF_GROUP,
+    CONF_HARDWARE_VERSION,
+    CONF_INFO_UPDATED,
+    CONF_HUMIDITY_DEADBAND,
     CONF_HUMIDITY_SENSOR,
+    CONF_MAX_PARALLEL,
+    CONF_MAX_SCAN_INTERVAL,
+    CONF_OPTIMISTIC,
     CONF_POWER_SENSOR,
+    CONF_POWER_WINDOWS,
+    CONF_SEND_DEBOUNCE,
+    CONF_SENSOR_UPDATE_INTERVAL,
+    CONF_TEMPERATURE_DEADBAND,
     CONF_TEMPERATURE_SENSOR,
     CONF_MODEL,
+    CONTROL_MODES,
+    DEFAULT_CONTROL,
+    DEFAULT_CONTROL_HYSTERESIS,
+    DEFAULT_CONTROL_MAX_COMMANDS,
+    DEFAULT_CONTROL_MIN_INTERVAL,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    DEFAULT_HUMIDITY_DEADBAND,
+    DEFAULT_MAX_PARALLEL,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_POWER_WINDOWS,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_SEND_DEBOUNCE,
+    DEFAULT_SENSOR_UPDATE_INTERVAL,
+    DEFAULT_TEMPERATURE_DEADBAND,
     DOMAIN,
     MODELS_ALL_DEVICES
 )
+from .power_stats import parse_power_windows
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -62,6 +103,22 @@ DEVICE_CLIMATE_SETTINGS = {
         vol.Optional(CONF_POWER_SENSOR): str,
 }
 
+def _group_schema(entities=None, max_parallel=DEFAULT_MAX_PARALLEL):
+    """Return the schema of the members of a climate group."""
+    return vol.Schema(
+        {
+            vol.Required(CONF_ENTITIES, default=entities or []): selector.EntitySelector(
+                selector.EntitySelectorConfig(
+                    domain="climate", integration=DOMAIN, multiple=True
+                )
+            ),
+            vol.Optional(CONF_MAX_PARALLEL, default=max_parallel): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=100)
+            ),
+        }
+    )
+
+
 async def validate_input(hass: core.HomeAssistant, data):
     """Validate that the user input allows us to connect to DataPoint.
 
@@ -84,6 +141,11 @@ async def validate_input(hass: core.HomeAssistant, data):
 
     return True
 
+
+def _validate_power_windows(value):
+    """Return the normalized list of power statistics windows."""
+    return ", ".join(str(window) for window in parse_power_windows(value))
+
 # Exceptions
 class AuthException(Exception):
     """Exception indicating an authentication error."""
@@ -105,6 +167,9 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
+        if self.config_entry.options.get(CONF_FLOW_TYPE) == CONF_GROUP:
+            return await self.async_step_group(user_input)
+
         errors = {}
         if user_input is not None:
             use_cloud = user_input.get(CONF_CLOUD_SUBDEVICES, False)
@@ -120,6 +185,27 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 temp_sensor = user_input.get(CONF_TEMPERATURE_SENSOR)
                 humidity_sensor = user_input.get(CONF_HUMIDITY_SENSOR)
                 power_sensor = user_input.get(CONF_POWER_SENSOR)
+                send_debounce = user_input.get(CONF_SEND_DEBOUNCE, DEFAULT_SEND_DEBOUNCE)
+                scan_interval = user_input.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+                fast_scan_interval = user_input.get(
+                    CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL)
+                max_scan_interval = user_input.get(
+                    CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL)
+                optimistic = user_input.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC)
+                temperature_deadband = user_input.get(
+                    CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND)
+                humidity_deadband = user_input.get(
+                    CONF_HUMIDITY_DEADBAND, DEFAULT_HUMIDITY_DEADBAND)
+                sensor_update_interval = user_input.get(
+                    CONF_SENSOR_UPDATE_INTERVAL, DEFAULT_SENSOR_UPDATE_INTERVAL)
+                power_windows = user_input.get(CONF_POWER_WINDOWS, DEFAULT_POWER_WINDOWS)
+                control = user_input.get(CONF_CONTROL, DEFAULT_CONTROL)
+                control_hysteresis = user_input.get(
+                    CONF_CONTROL_HYSTERESIS, DEFAULT_CONTROL_HYSTERESIS)
+                control_min_interval = user_input.get(
+                    CONF_CONTROL_MIN_INTERVAL, DEFAULT_CONTROL_MIN_INTERVAL)
+                control_max_commands = user_input.get(
+                    CONF_CONTROL_MAX_COMMANDS, DEFAULT_CONTROL_MAX_COMMANDS)
                 await validate_input(self.hass, user_input)
 
             if use_cloud and (
@@ -149,7 +235,28 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                             CONF_CLOUD_COUNTRY: cloud_country,
                             CONF_TEMPERATURE_SENSOR: temp_sensor,
                             CONF_HUMIDITY_SENSOR: humidity_sensor,
-                            CONF_POWER_SENSOR: power_sensor
+                            CONF_POWER_SENSOR: power_sensor,
+                            CONF_SEND_DEBOUNCE: send_debounce,
+                            CONF_SCAN_INTERVAL: scan_interval,
+                            CONF_FAST_SCAN_INTERVAL: fast_scan_interval,
+                            CONF_MAX_SCAN_INTERVAL: max_scan_interval,
+                            CONF_OPTIMISTIC: optimistic,
+                            CONF_TEMPERATURE_DEADBAND: temperature_deadband,
+                            CONF_HUMIDITY_DEADBAND: humidity_deadband,
+                            CONF_SENSOR_UPDATE_INTERVAL: sensor_update_interval,
+                            CONF_POWER_WINDOWS: power_windows,
+                            CONF_CONTROL: control,
+                            CONF_CONTROL_HYSTERESIS: control_hysteresis,
+                            CONF_CONTROL_MIN_INTERVAL: control_min_interval,
+                            CONF_CONTROL_MAX_COMMANDS: control_max_commands,
+                            CONF_FIRMWARE_VERSION: self.config_entry.options.get(
+                                CONF_FIRMWARE_VERSION),
+                            CONF_HARDWARE_VERSION: self.config_entry.options.get(
+                                CONF_HARDWARE_VERSION),
+                            CONF_INFO_UPDATED: self.config_entry.options.get(
+                                CONF_INFO_UPDATED),
+                            CONF_AC_MODEL: self.config_entry.options.get(
+                                CONF_AC_MODEL)
                         }
                 )
 
@@ -166,6 +273,31 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             temp_sensor = self.config_entry.options.get(CONF_TEMPERATURE_SENSOR, "")
             humidity_sensor = self.config_entry.options.get(CONF_HUMIDITY_SENSOR, "")
             power_sensor = self.config_entry.options.get(CONF_POWER_SENSOR, "")
+            send_debounce = self.config_entry.options.get(
+                CONF_SEND_DEBOUNCE, DEFAULT_SEND_DEBOUNCE)
+            scan_interval = self.config_entry.options.get(
+                CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+            fast_scan_interval = self.config_entry.options.get(
+                CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL)
+            max_scan_interval = self.config_entry.options.get(
+                CONF_MAX_SCAN_INTERVAL, DEFAULT_MAX_SCAN_INTERVAL)
+            optimistic = self.config_entry.options.get(
+                CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC)
+            temperature_deadband = self.config_entry.options.get(
+                CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND)
+            humidity_deadband = self.config_entry.options.get(
+                CONF_HUMIDITY_DEADBAND, DEFAULT_HUMIDITY_DEADBAND)
+            sensor_update_interval = self.config_entry.options.get(
+                CONF_SENSOR_UPDATE_INTERVAL, DEFAULT_SENSOR_UPDATE_INTERVAL)
+            power_windows = self.config_entry.options.get(
+                CONF_POWER_WINDOWS, DEFAULT_POWER_WINDOWS)
+            control = self.config_entry.options.get(CONF_CONTROL, DEFAULT_CONTROL)
+            control_hysteresis = self.config_entry.options.get(
+                CONF_CONTROL_HYSTERESIS, DEFAULT_CONTROL_HYSTERESIS)
+            control_min_interval = self.config_entry.options.get(
+                CONF_CONTROL_MIN_INTERVAL, DEFAULT_CONTROL_MIN_INTERVAL)
+            control_max_commands = self.config_entry.options.get(
+                CONF_CONTROL_MAX_COMMANDS, DEFAULT_CONTROL_MAX_COMMANDS)
             settings_schema = settings_schema.extend(
                 {
                     vol.Required(CONF_HOST, default=host): str,
@@ -173,6 +305,41 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Optional(CONF_TEMPERATURE_SENSOR, default=temp_sensor): str,
                     vol.Optional(CONF_HUMIDITY_SENSOR, default=humidity_sensor): str,
                     vol.Optional(CONF_POWER_SENSOR, default=power_sensor): str,
+                    vol.Optional(CONF_SEND_DEBOUNCE, default=send_debounce): vol.All(
+                        vol.Coerce(float), vol.Range(min=0, max=10)
+                    ),
+                    vol.Optional(CONF_SCAN_INTERVAL, default=scan_interval): vol.All(
+                        vol.Coerce(int), vol.Range(min=1)
+                    ),
+                    vol.Optional(CONF_FAST_SCAN_INTERVAL, default=fast_scan_interval): vol.All(
+                        vol.Coerce(int), vol.Range(min=1)
+                    ),
+                    vol.Optional(CONF_MAX_SCAN_INTERVAL, default=max_scan_interval): vol.All(
+                        vol.Coerce(int), vol.Range(min=1)
+                    ),
+                    vol.Optional(CONF_OPTIMISTIC, default=optimistic): bool,
+                    vol.Optional(
+                        CONF_TEMPERATURE_DEADBAND, default=temperature_deadband
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                    vol.Optional(
+                        CONF_HUMIDITY_DEADBAND, default=humidity_deadband
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=20)),
+                    vol.Optional(
+                        CONF_SENSOR_UPDATE_INTERVAL, default=sensor_update_interval
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    vol.Optional(CONF_POWER_WINDOWS, default=power_windows): vol.All(
+                        str, _validate_power_windows
+                    ),
+                    vol.Optional(CONF_CONTROL, default=control): vol.In(CONTROL_MODES),
+                    vol.Optional(
+                        CONF_CONTROL_HYSTERESIS, default=control_hysteresis
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                    vol.Optional(
+                        CONF_CONTROL_MIN_INTERVAL, default=control_min_interval
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    vol.Optional(
+                        CONF_CONTROL_MAX_COMMANDS, default=control_max_commands
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
                 }
             )
 
@@ -181,6 +348,32 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         )
 
 
+    async def async_step_group(self, user_input=None):
+        """Manage the members of a climate group."""
+        errors = {}
+        if user_input is not None:
+            if not user_input[CONF_ENTITIES]:
+                errors["base"] = "no_device_selected"
+            else:
+                return self.async_create_entry(
+                    title="",
+                    data={
+                        CONF_FLOW_TYPE: CONF_GROUP,
+                        CONF_ENTITIES: user_input[CONF_ENTITIES],
+                        CONF_MAX_PARALLEL: user_input[CONF_MAX_PARALLEL],
+                    },
+                )
+
+        return self.async_show_form(
+            step_id="group",
+            data_schema=_group_schema(
+                self.config_entry.options.get(CONF_ENTITIES),
+                self.config_entry.options.get(CONF_MAX_PARALLEL, DEFAULT_MAX_PARALLEL),
+            ),
+            errors=errors,
+        )
+
+
 class XiaomiACPartnerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a Xiaomi Air Conditioning Companion config flow."""
 
@@ -234,7 +427,26 @@ class XiaomiACPartnerFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input=None):
         """Handle a flow initialized by the user."""
-        return await self.async_step_cloud()
+        return self.async_show_menu(step_id="user", menu_options=["cloud", "group"])
+
+    async def async_step_group(self, user_input=None):
+        """Create a climate entity which controls a group of devices."""
+        errors = {}
+        if user_input is not None:
+            if not user_input[CONF_ENTITIES]:
+                errors["base"] = "no_device_selected"
+            else:
+                return self.async_create_entry(
+                    title=user_input[CONF_NAME],
+                    data={
+                        CONF_FLOW_TYPE: CONF_GROUP,
+                        CONF_ENTITIES: user_input[CONF_ENTITIES],
+                        CONF_MAX_PARALLEL: user_input[CONF_MAX_PARALLEL],
+                    },
+                )
+
+        schema = vol.Schema({vol.Required(CONF_NAME): str}).extend(_group_schema().schema)
+        return self.async_show_form(step_id="group", data_schema=schema, errors=errors)
 
     async def async_step_zeroconf(self, discovery_info):
         """Handle zeroconf discovery."""
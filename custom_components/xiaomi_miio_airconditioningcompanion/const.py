@@ -9,29 +9,116 @@ from homeassistant.components.sensor import (
 )
 
 from homeassistant.const import (
-    POWER_WATT
+    ENERGY_KILO_WATT_HOUR,
+    POWER_WATT,
+    TIME_MILLISECONDS
 )
+from homeassistant.helpers.entity import EntityCategory
 
 DEFAULT_NAME = "Xiaomi Air Conditioning Companion"
 DOMAIN = "xiaomi_miio_airconditioningcompanion"
 DOMAINS = ["climate", "sensor"]
 DATA_KEY = "xiaomi_miio_airconditioningcompanion_data"
+DATA_CODES = "xiaomi_miio_airconditioningcompanion_codes"
+DATA_SESSIONS = "xiaomi_miio_airconditioningcompanion_sessions"
+DATA_SCHEDULES = "xiaomi_miio_airconditioningcompanion_schedules"
 DATA_STATE = "state"
 DATA_DEVICE = "device"
+DATA_COORDINATOR = "coordinator"
+DATA_OPTIONS = "options"
+DATA_PIPELINE = "pipeline"
 
 CONF_COMMAND = "command"
+CONF_WAIT = "wait"
 CONF_HUMIDITY_SENSOR = 'humidity_sensor'
 CONF_POWER_SENSOR = 'power_sensor'
 CONF_TEMPERATURE_SENSOR = 'temperature_sensor'
 CONF_MIN_TEMP = "min_temp"
 CONF_MAX_TEMP = "max_temp"
+CONF_MAX_PARALLEL = "max_parallel"
+# flow type of the config entries of climate groups
+CONF_GROUP = "group"
 CONF_MODEL = "model"
 CONF_MAC = "mac"
 CONF_SLOT = "slot"
+CONF_SEND_DEBOUNCE = "send_debounce"
+CONF_FAST_SCAN_INTERVAL = "fast_scan_interval"
+CONF_MAX_SCAN_INTERVAL = "max_scan_interval"
+CONF_OPTIMISTIC = "optimistic"
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+CONF_HUMIDITY_DEADBAND = "humidity_deadband"
+CONF_SENSOR_UPDATE_INTERVAL = "sensor_update_interval"
+CONF_POWER_WINDOWS = "power_windows"
+CONF_CONTROL = "control"
+CONF_CONTROL_HYSTERESIS = "control_hysteresis"
+CONF_CONTROL_MIN_INTERVAL = "control_min_interval"
+CONF_CONTROL_MAX_COMMANDS = "control_max_commands"
+CONF_FIRMWARE_VERSION = "firmware_version"
+CONF_HARDWARE_VERSION = "hardware_version"
+CONF_INFO_UPDATED = "info_updated"
+CONF_AC_MODEL = "ac_model"
+
+# options which only cache device data and do not require a reload
+CACHED_OPTIONS = [
+    CONF_AC_MODEL,
+    CONF_FIRMWARE_VERSION,
+    CONF_HARDWARE_VERSION,
+    CONF_INFO_UPDATED
+]
 
 DEFAULT_TIMEOUT = 10
+MIIO_PORT = 54321
+MIIO_TIMEOUT = 5
+# bounds in seconds of the request timeout estimated from the round trip times
+MIIO_MIN_TIMEOUT = 0.1
+# lower bound of the timeout of commands which change the device state
+MIIO_COMMAND_MIN_TIMEOUT = 1
+RTT_CLOCK_GRANULARITY = 0.01
+MIIO_RETRY_COUNT = 3
+# request ids skipped after restoring a session, in case it was not stored
+# with the latest request id
+SESSION_REQUEST_ID_STEP = 100
+# requests in a row without reply which open the circuit of a device
+CIRCUIT_FAILURE_THRESHOLD = 3
+# seconds until the first probe of an open circuit, doubling up to the maximum
+CIRCUIT_OPEN_TIME = 30
+CIRCUIT_MAX_OPEN_TIME = 300
+# upper bounds in milliseconds of the request latency histogram
+LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# configuration commands of recently used states kept encoded
+CONFIGURATION_CACHE_SIZE = 256
 DEFAULT_SLOT = 30
+# seconds between two reads of the learning result, growing from min to max
+LEARN_POLL_MIN = 0.1
+LEARN_POLL_MAX = 1.0
+LEARN_POLL_BACKOFF = 1.5
 DEFAULT_DELAY = 1
+DEFAULT_SEND_DEBOUNCE = 0.5
+DEFAULT_MAX_PARALLEL = 10
+DEFAULT_OPTIMISTIC = True
+DEFAULT_TEMPERATURE_DEADBAND = 0.1
+DEFAULT_HUMIDITY_DEADBAND = 1.0
+DEFAULT_SENSOR_UPDATE_INTERVAL = 30
+# minutes of the rolling load power statistics
+DEFAULT_POWER_WINDOWS = "15, 60"
+# initial load power samples per device, grown to cover the longest window
+POWER_BUFFER_SIZE = 1440
+# seconds between two state writes of the energy sensor
+ENERGY_UPDATE_INTERVAL = 60
+# control of the setpoint from the external temperature sensor
+CONTROL_OFF = "off"
+CONTROL_HYSTERESIS = "hysteresis"
+CONTROL_PI = "pi"
+CONTROL_MODES = [CONTROL_OFF, CONTROL_HYSTERESIS, CONTROL_PI]
+DEFAULT_CONTROL = CONTROL_OFF
+DEFAULT_CONTROL_HYSTERESIS = 0.5
+DEFAULT_CONTROL_MIN_INTERVAL = 300
+DEFAULT_CONTROL_MAX_COMMANDS = 6
+# degrees per degree of error and per degree hour of the PI controller
+CONTROL_KP = 1.0
+CONTROL_KI = 0.5
+# largest shift in degrees of the setpoint sent to the air conditioner
+CONTROL_MAX_OFFSET = 3
 TARGET_TEMPERATURE_STEP = 1
 DEFAULT_TARGET_TEMPERATURE = 26
 
@@ -39,6 +126,7 @@ ATTR_AIR_CONDITION_MODEL = "ac_model"
 ATTR_SWING_MODE = "swing_mode"
 ATTR_FAN_MODE = "fan_mode"
 ATTR_LOAD_POWER = "load_power"
+ATTR_ENERGY = "energy"
 ATTR_LED = "led"
 ATTR_POWER = "power"
 ATTR_IS_ON = "is_on"
@@ -46,6 +134,8 @@ ATTR_BRAND = "air_condition_brand"
 ATTR_CONFIGURATION = "air_condition_configuration"
 ATTR_REMOTE_NUMBER = "air_condition_remote"
 ATTR_DEVICE_TYPE = "device_type"
+ATTR_OPERATION_MODE = "operation_mode"
+ATTR_TARGET_TEMPERATURE = "target_temperature"
 
 MODEL_LUMI_ACPARTNER_V1 = "lumi.acpartner.v1"
 MODEL_LUMI_ACPARTNER_V2 = "lumi.acpartner.v2"
@@ -66,7 +156,19 @@ MODELS_MIIO = [
 MODELS_ALL_DEVICES = MODELS_MIIO
 
 DEFAULT_SCAN_INTERVAL = 60
+DEFAULT_FAST_SCAN_INTERVAL = 5
+DEFAULT_MAX_SCAN_INTERVAL = 300
 SCAN_INTERVAL = timedelta(seconds=DEFAULT_SCAN_INTERVAL)
+# seconds of fast polling after a command or a power sensor change
+FAST_POLL_WINDOW = 30
+# the interval doubles after this number of polls without a state change
+STABLE_POLLS_PER_STEP = 3
+# seconds until the device has applied a command and its state is read back
+VERIFY_DELAY = 3
+DEVICE_INFO_MAX_AGE = timedelta(days=1)
+
+# coordinator context of entities which need the full status
+PROPERTY_STATUS = "status"
 
 ACPARTNER_PROPS = [
     ATTR_AIR_CONDITION_MODEL,
@@ -83,25 +185,38 @@ class XiaomiACPartnerSensorDescription(
 ):
     """Class to describe an Xiaomi Air Conditioning Companion sensor."""
 
+    # properties of ACPARTNER_PROPS the sensor needs
+    properties: tuple[str, ...] = (PROPERTY_STATUS,)
+
+
+# rolling load power statistics by key and name
+POWER_STATISTICS = {
+    "mean": "Mean",
+    "max": "Max",
+    "min": "Min",
+}
 
 ACPARTNER_SENSORS: tuple[XiaomiACPartnerSensorDescription, ...] = (
     XiaomiACPartnerSensorDescription(
         key=ATTR_IS_ON,
         name="Status",
         state_class=SensorStateClass.MEASUREMENT,
-        icon="mdi:chip"
+        icon="mdi:chip",
+        properties=(ATTR_POWER,)
     ),
     XiaomiACPartnerSensorDescription(
         key=ATTR_LOAD_POWER,
         name="Load Power",
         native_unit_of_measurement=POWER_WATT,
         state_class=SensorStateClass.MEASUREMENT,
-        icon="mdi:flash"
+        icon="mdi:flash",
+        properties=(ATTR_LOAD_POWER,)
     ),
     XiaomiACPartnerSensorDescription(
         key=ATTR_BRAND,
         name="Climate Brand",
-        icon="mdi:watermark"
+        icon="mdi:watermark",
+        properties=(ATTR_AIR_CONDITION_MODEL,)
     ),
     XiaomiACPartnerSensorDescription(
         key=ATTR_CONFIGURATION,
@@ -111,11 +226,74 @@ ACPARTNER_SENSORS: tuple[XiaomiACPartnerSensorDescription, ...] = (
     XiaomiACPartnerSensorDescription(
         key=ATTR_REMOTE_NUMBER,
         name="Climate Remote Number",
-        icon="mdi:remote"
+        icon="mdi:remote",
+        properties=(ATTR_AIR_CONDITION_MODEL,)
     ),
     XiaomiACPartnerSensorDescription(
         key=ATTR_DEVICE_TYPE,
         name="Device Type",
-        icon="mdi:devices"
+        icon="mdi:devices",
+        properties=(ATTR_AIR_CONDITION_MODEL,)
     )
 )
+
+ENERGY_SENSOR = XiaomiACPartnerSensorDescription(
+    key=ATTR_ENERGY,
+    name="Energy",
+    native_unit_of_measurement=ENERGY_KILO_WATT_HOUR,
+    device_class=SensorDeviceClass.ENERGY,
+    state_class=SensorStateClass.TOTAL_INCREASING,
+    icon="mdi:lightning-bolt",
+    properties=(ATTR_LOAD_POWER,)
+)
+
+# request metrics of the device, disabled by default
+METRIC_SENSORS: tuple[XiaomiACPartnerSensorDescription, ...] = (
+    XiaomiACPartnerSensorDescription(
+        key="last_latency",
+        name="Request Latency",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        icon="mdi:timer-outline",
+        properties=()
+    ),
+    XiaomiACPartnerSensorDescription(
+        key="latency_p95",
+        name="Request Latency P95",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        icon="mdi:timer-outline",
+        properties=()
+    ),
+    XiaomiACPartnerSensorDescription(
+        key="timeouts",
+        name="Request Timeouts",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        icon="mdi:timer-sand-empty",
+        properties=()
+    ),
+    XiaomiACPartnerSensorDescription(
+        key="errors",
+        name="Request Errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        icon="mdi:alert-circle-outline",
+        properties=()
+    ),
+    XiaomiACPartnerSensorDescription(
+        key="last_success",
+        name="Last Successful Request",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        icon="mdi:clock-check-outline",
+        properties=()
+    ),
+)
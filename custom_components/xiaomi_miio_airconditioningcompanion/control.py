@@ -0,0 +1,97 @@
+"""Setpoint control of the Xiaomi Air Conditioning Companion component."""
+from collections import deque
+from time import monotonic
+
+from .const import (
+    CONTROL_HYSTERESIS,
+    CONTROL_KI,
+    CONTROL_KP,
+    CONTROL_MAX_OFFSET,
+    CONTROL_PI,
+    TARGET_TEMPERATURE_STEP
+)
+
+# seconds the command budget is counted over
+BUDGET_PERIOD = 3600
+
+
+class XiaomiACPartnerThermostat:
+    """Shift the setpoint sent to the air conditioner by an external reading.
+
+    The air conditioner regulates on the sensor in its indoor unit, which
+    usually does not measure the temperature of the room. The controller
+    returns an offset in whole degrees to add to the target temperature,
+    negative while the room is warmer than the target. With hysteresis the
+    offset is one step once the error exceeds the band and is kept until
+    the error changes its sign. The PI controller adds the integrated
+    error, limited to the largest offset. The error is integrated over the
+    time since the previous update, so update is called on every poll of
+    the device as well and the integral advances while the reading holds.
+
+    A command may only be sent min_interval seconds after the last one and
+    at most max_commands times per hour.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, mode, hysteresis, min_interval, max_commands,
+                 kp=CONTROL_KP, ki=CONTROL_KI, max_offset=CONTROL_MAX_OFFSET):
+        self.mode = mode
+        self._hysteresis = hysteresis
+        self._min_interval = min_interval
+        self._max_commands = max_commands
+        self._kp = kp
+        self._ki = ki
+        self._max_offset = max_offset
+        self._commands = deque()
+        self.offset = 0
+        self._integral = 0.0
+        self._last_update = None
+
+    def reset(self):
+        """Forget the offset and the integrated error."""
+        self.offset = 0
+        self._integral = 0.0
+        self._last_update = None
+
+    def update(self, target, current):
+        """Return the offset of the setpoint for a target and a reading."""
+        now = monotonic()
+        error = current - target
+        if self.mode == CONTROL_HYSTERESIS:
+            if error > self._hysteresis:
+                offset = -TARGET_TEMPERATURE_STEP
+            elif error < -self._hysteresis:
+                offset = TARGET_TEMPERATURE_STEP
+            elif self.offset * error >= 0:
+                # back at the target from the side the offset was set for
+                offset = 0
+            else:
+                offset = self.offset
+        elif self.mode == CONTROL_PI:
+            if self._last_update is not None and self._ki:
+                limit = self._max_offset / self._ki
+                self._integral += error * (now - self._last_update) / 3600
+                self._integral = min(max(self._integral, -limit), limit)
+            output = -(self._kp * error + self._ki * self._integral)
+            offset = round(min(max(output, -self._max_offset), self._max_offset))
+        else:
+            offset = 0
+        self._last_update = now
+        return offset
+
+    def retry_in(self):
+        """Return the seconds until the budget allows the next command."""
+        now = monotonic()
+        while self._commands and now - self._commands[0] >= BUDGET_PERIOD:
+            self._commands.popleft()
+        if not self._commands:
+            return 0
+        delay = self._commands[-1] + self._min_interval - now
+        if len(self._commands) >= self._max_commands:
+            delay = max(delay, self._commands[0] + BUDGET_PERIOD - now)
+        return max(delay, 0)
+
+    def record_command(self, offset):
+        """Count a command sent with an offset against the budget."""
+        self._commands.append(monotonic())
+        self.offset = offset
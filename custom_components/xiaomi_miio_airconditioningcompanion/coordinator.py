@@ -0,0 +1,311 @@
+"""Coordinator of the Xiaomi Air Conditioning Companion component."""
+# pylint: disable=import-error
+import logging
+from datetime import timedelta
+from time import monotonic
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed
+)
+from miio import DeviceError, DeviceException
+from miio.airconditioningcompanion import FanSpeed, Led, SwingMode
+
+from .const import (
+    ATTR_AIR_CONDITION_MODEL,
+    ATTR_BRAND,
+    ATTR_CONFIGURATION,
+    ATTR_DEVICE_TYPE,
+    ATTR_FAN_MODE,
+    ATTR_IS_ON,
+    ATTR_LED,
+    ATTR_LOAD_POWER,
+    ATTR_OPERATION_MODE,
+    ATTR_POWER,
+    ATTR_REMOTE_NUMBER,
+    ATTR_SWING_MODE,
+    ATTR_TARGET_TEMPERATURE,
+    ACPARTNER_PROPS,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_SCAN_INTERVAL,
+    DOMAIN,
+    FAST_POLL_WINDOW,
+    POWER_BUFFER_SIZE,
+    STABLE_POLLS_PER_STEP
+)
+from .power_stats import XiaomiACPartnerEnergyMeter, XiaomiACPartnerPowerStatistics
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _enum_name(value):
+    """Return the lower case name of an enum member or None."""
+    return value.name.lower() if value is not None else None
+
+
+def decode_status(state):
+    """Decode a status of the device into a dict of plain attributes."""
+    mode = state.mode
+    return {
+        ATTR_AIR_CONDITION_MODEL:
+            state.air_condition_model.hex() if state.air_condition_model else None,
+        ATTR_LOAD_POWER: state.load_power,
+        ATTR_POWER: state.power,
+        ATTR_IS_ON: state.is_on,
+        ATTR_LED: state.led,
+        ATTR_TARGET_TEMPERATURE: state.target_temperature,
+        ATTR_OPERATION_MODE: mode.name if mode is not None else None,
+        ATTR_FAN_MODE: _enum_name(state.fan_speed),
+        ATTR_SWING_MODE: _enum_name(state.swing_mode),
+        ATTR_BRAND: state.air_condition_brand,
+        ATTR_CONFIGURATION: state.air_condition_configuration,
+        ATTR_REMOTE_NUMBER: state.air_condition_remote,
+        ATTR_DEVICE_TYPE: state.device_type,
+    }
+
+
+def _decode_model(model):
+    """Decode the attributes derived from the air conditioner model."""
+    air_condition_model = bytes.fromhex(model)
+    return {
+        ATTR_AIR_CONDITION_MODEL: model,
+        ATTR_DEVICE_TYPE: air_condition_model[1],
+        ATTR_BRAND: int(air_condition_model[2:4].hex(), 16),
+        ATTR_REMOTE_NUMBER: int(air_condition_model[4:8].hex(), 16),
+    }
+
+
+def _decode_led(value):
+    """Decode the led state like the status does."""
+    if str(value) == Led.On.value:
+        return True
+    if str(value) == Led.Off.value:
+        return False
+    return None
+
+
+def _decode_power(value):
+    """Decode the power state."""
+    power = "on" if str(value) in ("on", "1") else "off"
+    return {ATTR_POWER: power, ATTR_IS_ON: power == "on"}
+
+
+PROPERTY_DECODERS = {
+    ATTR_AIR_CONDITION_MODEL: _decode_model,
+    ATTR_FAN_MODE: lambda value: {ATTR_FAN_MODE: _enum_name(FanSpeed(int(value)))},
+    ATTR_LED: lambda value: {ATTR_LED: _decode_led(value)},
+    ATTR_POWER: _decode_power,
+    ATTR_SWING_MODE: lambda value: {ATTR_SWING_MODE: _enum_name(SwingMode(str(value)))},
+    ATTR_LOAD_POWER: lambda value: {ATTR_LOAD_POWER: int(float(value))},
+}
+
+
+def decode_properties(properties, values):
+    """Decode the values of a property read into attributes of decode_status."""
+    if len(values) != len(properties):
+        raise ValueError("Expected {} values, got {}".format(len(properties), values))
+
+    data = {}
+    for prop, value in zip(properties, values):
+        data.update(PROPERTY_DECODERS[prop](value))
+    return data
+
+
+def _stable_part(data):
+    """Return the part of the decoded status which is expected to be stable."""
+    return {key: value for key, value in data.items() if key != ATTR_LOAD_POWER}
+
+
+class XiaomiACPartnerCoordinator(DataUpdateCoordinator):
+    """Poll the status of one Xiaomi Air Conditioning Companion.
+
+    A single request per interval is shared by the climate entity and all
+    sensors of the same host. Listeners pass the properties they need as
+    context, PROPERTY_STATUS stands for the full status. If every listener
+    needs only properties of ACPARTNER_PROPS, their union is read with one
+    get_prop request and merged into the last full status.
+
+    The interval adapts to the device: it is short for a while after a
+    command, grows while the state is stable and backs off exponentially
+    while the device is unreachable.
+
+    While the circuit breaker of the device is open, polls are rejected at
+    once and the next poll is the probe of the circuit breaker.
+
+    Every load power read by a poll is added to the power statistics and
+    the energy meter.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, hass: HomeAssistant, host, acpartner,
+                 scan_interval=DEFAULT_SCAN_INTERVAL,
+                 fast_scan_interval=DEFAULT_FAST_SCAN_INTERVAL,
+                 max_scan_interval=DEFAULT_MAX_SCAN_INTERVAL,
+                 power_windows=()):
+        self._scan_interval = scan_interval
+        self._fast_scan_interval = min(fast_scan_interval, scan_interval)
+        self._max_scan_interval = max(max_scan_interval, scan_interval)
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="{}_{}".format(DOMAIN, host),
+            update_interval=timedelta(seconds=scan_interval),
+        )
+        self.host = host
+        self.acpartner = acpartner
+        self._fast_until = 0.0
+        self._stable_polls = 0
+        self._failures = 0
+        self._unsub_verify = None
+        self.verifying = False
+        self._property_reads = True
+        self.power_statistics = XiaomiACPartnerPowerStatistics(
+            [minutes * 60 for minutes in power_windows], POWER_BUFFER_SIZE
+        )
+        self.energy_meter = XiaomiACPartnerEnergyMeter()
+        acpartner.circuit_breaker.open_listener = self._async_circuit_opened
+
+    @callback
+    def async_verify_later(self, delay):
+        """Read the state back once after the device had time to apply a command.
+
+        A verification which is already scheduled is replaced, so a burst of
+        commands results in a single read.
+        """
+        if self._unsub_verify is not None:
+            self._unsub_verify()
+        self._unsub_verify = async_call_later(self.hass, delay, self._async_verify)
+
+    async def _async_verify(self, _now):
+        """Refresh the state to verify the last command."""
+        self._unsub_verify = None
+        self.verifying = True
+        try:
+            await self.async_refresh()
+        finally:
+            self.verifying = False
+
+    async def async_shutdown(self) -> None:
+        """Cancel a scheduled verification and stop polling."""
+        if self._unsub_verify is not None:
+            self._unsub_verify()
+            self._unsub_verify = None
+        self.acpartner.circuit_breaker.open_listener = None
+        await super().async_shutdown()
+
+    @callback
+    def async_note_activity(self):
+        """Poll quickly for a while after a command or an external change."""
+        self._fast_until = monotonic() + FAST_POLL_WINDOW
+        self._stable_polls = 0
+        if self.update_interval.total_seconds() > self._fast_scan_interval:
+            self.update_interval = timedelta(seconds=self._fast_scan_interval)
+            if self._listeners:
+                self._schedule_refresh()
+
+    @callback
+    def _async_circuit_opened(self):
+        """Show the device unavailable as soon as it stopped replying."""
+        if self.last_update_success:
+            self.async_set_update_error(
+                UpdateFailed("{} does not reply".format(self.host))
+            )
+
+    def _next_interval(self):
+        """Return the seconds until the next poll."""
+        retry_in = self.acpartner.circuit_breaker.retry_in
+        if retry_in is not None:
+            return max(retry_in, 1)
+        if self._failures:
+            return min(
+                self._scan_interval * 2 ** (self._failures - 1), self._max_scan_interval
+            )
+        if monotonic() < self._fast_until:
+            return self._fast_scan_interval
+        return min(
+            self._scan_interval * 2 ** (self._stable_polls // STABLE_POLLS_PER_STEP),
+            self._max_scan_interval,
+        )
+
+    async def _async_update_data(self):
+        """Fetch state from the device."""
+        try:
+            data = await self._async_fetch_data()
+        except UpdateFailed:
+            self._failures += 1
+            raise
+        else:
+            if self._failures or self.data is None or (
+                _stable_part(data) != _stable_part(self.data)
+            ):
+                self._stable_polls = 0
+            else:
+                self._stable_polls += 1
+            self._failures = 0
+            return data
+        finally:
+            self.update_interval = timedelta(seconds=self._next_interval())
+
+    def _requested_properties(self):
+        """Return the properties needed by all listeners or None for the full status."""
+        properties = set()
+        for context in self.async_contexts():
+            properties.update(context)
+        if not properties or not properties.issubset(ACPARTNER_PROPS):
+            return None
+        return [prop for prop in ACPARTNER_PROPS if prop in properties]
+
+    async def _async_fetch_data(self):
+        """Fetch and decode the state of the device."""
+        properties = self._requested_properties() if self._property_reads else None
+        if properties is not None and self.data is not None:
+            try:
+                values = await self.acpartner.get_properties(properties)
+                data = dict(self.data)
+                data.update(decode_properties(properties, values))
+                if ATTR_LOAD_POWER in properties:
+                    self._add_power_sample(data)
+                return data
+            except (DeviceError, KeyError, TypeError, ValueError) as ex:
+                _LOGGER.debug(
+                    "%s does not support property reads, using the full status: %s",
+                    self.host,
+                    ex,
+                )
+                self._property_reads = False
+            except DeviceException as ex:
+                raise UpdateFailed(
+                    "Got exception while fetching the state: {}".format(ex)
+                ) from ex
+
+        return await self._async_fetch_status()
+
+    async def _async_fetch_status(self):
+        """Fetch and decode the full status of the device."""
+        try:
+            state = await self.acpartner.status()
+        except DeviceException as ex:
+            raise UpdateFailed(
+                "Got exception while fetching the state: {}".format(ex)
+            ) from ex
+
+        _LOGGER.debug("Got new state: %s", state)
+        try:
+            data = decode_status(state)
+        except (TypeError, ValueError) as ex:
+            raise UpdateFailed(
+                "Unable to decode the state {}: {}".format(state, ex)
+            ) from ex
+        self._add_power_sample(data)
+        return data
+
+    def _add_power_sample(self, data):
+        """Add the load power just read to the power statistics and energy."""
+        load_power = data.get(ATTR_LOAD_POWER)
+        if load_power is not None:
+            timestamp = monotonic()
+            self.power_statistics.add(timestamp, load_power)
+            self.energy_meter.add(timestamp, load_power)
@@ -0,0 +1,36 @@
+"""Diagnostics of the Xiaomi Air Conditioning Companion component."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.components.xiaomi_miio.const import (
+    CONF_CLOUD_PASSWORD,
+    CONF_CLOUD_USERNAME
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST, CONF_TOKEN
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_MAC, DATA_COORDINATOR, DATA_DEVICE, DOMAIN
+
+TO_REDACT = {CONF_CLOUD_PASSWORD, CONF_CLOUD_USERNAME, CONF_MAC, CONF_TOKEN}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Return the options, the last status and the request metrics of a device."""
+    diagnostics = {"options": async_redact_data(dict(entry.options), TO_REDACT)}
+
+    host_data = hass.data.get(DOMAIN, {}).get(entry.options.get(CONF_HOST))
+    if host_data is None:
+        return diagnostics
+
+    coordinator = host_data.get(DATA_COORDINATOR)
+    if coordinator is not None:
+        diagnostics["coordinator"] = {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "data": coordinator.data,
+        }
+    acpartner = host_data.get(DATA_DEVICE)
+    if acpartner is not None:
+        diagnostics["metrics"] = acpartner.metrics.as_dict()
+        diagnostics["circuit_breaker"] = acpartner.circuit_breaker.as_dict()
+        diagnostics["request_timeouts"] = acpartner.request_timeouts
+    return diagnostics
@@ -0,0 +1,43 @@
+"""Infrared learning of the Xiaomi Air Conditioning Companion component."""
+import asyncio
+import logging
+
+from miio import DeviceException
+
+from .const import LEARN_POLL_BACKOFF, LEARN_POLL_MAX, LEARN_POLL_MIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_learn_code(acpartner, slot, timeout):
+    """Return the infrared code captured in slot or None after timeout seconds.
+
+    The result is polled quickly right after learning starts, when a key
+    press is most likely, and less often the longer nothing is captured.
+    Learning is stopped on the device in any case, also on cancellation.
+    """
+    await acpartner.learn(slot)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    interval = LEARN_POLL_MIN
+    try:
+        while True:
+            message = await acpartner.learn_result()
+            # FIXME: Improve python-miio here?
+            message = message[0]
+            _LOGGER.debug("Message received from device: '%s'", message)
+            if message.startswith("FE"):
+                return message
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * LEARN_POLL_BACKOFF, LEARN_POLL_MAX)
+    finally:
+        try:
+            await acpartner.learn_stop(slot)
+        except DeviceException as ex:
+            _LOGGER.debug("Unable to stop learning: %s", ex)
@@ -0,0 +1,127 @@
+"""Request metrics of the Xiaomi Air Conditioning Companion component."""
+from bisect import bisect_left
+
+from homeassistant.util.dt import utcnow
+
+from .const import LATENCY_BUCKETS
+
+
+class _LatencyHistogram:
+    """Counts of latencies in milliseconds by the upper bounds of LATENCY_BUCKETS.
+
+    The last count is for latencies above the largest bucket.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+
+    def add(self, latency):
+        """Count a latency."""
+        self.counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.total += 1
+
+    def percentile(self, percent):
+        """Return the upper bound of the bucket of a percentile or None.
+
+        Latencies above the largest bucket are reported as its bound.
+        """
+        if not self.total:
+            return None
+        rank = self.total * percent / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+    def as_dict(self):
+        """Return the counts by bucket."""
+        buckets = {"le_{}".format(bound): count for bound, count in zip(
+            LATENCY_BUCKETS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return buckets
+
+
+class _MethodMetrics:
+    """Metrics of one miIO method."""
+
+    def __init__(self):
+        self.latency = _LatencyHistogram()
+        self.successes = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def as_dict(self):
+        """Return the metrics."""
+        return {
+            "successes": self.successes,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "latency_ms": self.latency.as_dict(),
+        }
+
+
+class XiaomiACPartnerMetrics:
+    """Latency, timeouts and errors of the requests to one device.
+
+    Every request is recorded once when it succeeds or finally fails, every
+    attempt without a reply is counted as a timeout.
+    """
+
+    def __init__(self):
+        self._methods = {}
+        self.latency = _LatencyHistogram()
+        self.last_latency = None
+        self.last_success = None
+        self.last_error = None
+        self.timeouts = 0
+        self.errors = 0
+
+    def _method(self, method):
+        """Return the metrics of a method."""
+        if method not in self._methods:
+            self._methods[method] = _MethodMetrics()
+        return self._methods[method]
+
+    def record_success(self, method, latency):
+        """Record a reply received after latency seconds."""
+        latency = latency * 1000
+        metrics = self._method(method)
+        metrics.successes += 1
+        metrics.latency.add(latency)
+        self.latency.add(latency)
+        self.last_latency = round(latency, 1)
+        self.last_success = utcnow()
+
+    def record_timeout(self, method):
+        """Record an attempt without reply."""
+        self._method(method).timeouts += 1
+        self.timeouts += 1
+
+    def record_error(self, method, error):
+        """Record a request which failed."""
+        self._method(method).errors += 1
+        self.errors += 1
+        self.last_error = str(error)
+
+    @property
+    def latency_p95(self):
+        """Return the 95th percentile of the latency in milliseconds."""
+        return self.latency.percentile(95)
+
+    def as_dict(self):
+        """Return all metrics."""
+        return {
+            "last_latency_ms": self.last_latency,
+            "latency_p95_ms": self.latency_p95,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_error": self.last_error,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "latency_ms": self.latency.as_dict(),
+            "methods": {
+                method: metrics.as_dict() for method, metrics in self._methods.items()
+            },
+        }
@@ -0,0 +1,86 @@
+"""Infrared send pipeline of the Xiaomi Air Conditioning Companion component."""
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class XiaomiACPartnerSendPipeline:
+    """Serialize and pace the infrared sends of one device.
+
+    Every queued sequence is a list of coroutine functions. The sends are
+    scheduled against monotonic deadlines so the spacing between two sends
+    does not drift with the time a single send takes.
+    """
+
+    def __init__(self, hass: HomeAssistant, host):
+        self.hass = hass
+        self._host = host
+        self._queue = asyncio.Queue()
+        self._worker = None
+
+    @callback
+    def async_enqueue(self, sends, num_repeats=1, delay=0):
+        """Queue a sequence of sends and return a future of its result."""
+        future = self.hass.loop.create_future()
+        self._queue.put_nowait((sends, num_repeats, delay, future))
+
+        if self._worker is None or self._worker.done():
+            self._worker = self.hass.async_create_background_task(
+                self._async_run(), "{} send pipeline".format(self._host)
+            )
+
+        return future
+
+    async def _async_run(self):
+        """Work through the queued sequences."""
+        while not self._queue.empty():
+            sends, num_repeats, delay, future = self._queue.get_nowait()
+            if future.cancelled():
+                continue
+
+            try:
+                result = await self._async_send_sequence(sends, num_repeats, delay)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected error while sending to %s", self._host)
+                result = False
+
+            if not future.done():
+                future.set_result(result)
+
+    async def _async_send_sequence(self, sends, num_repeats, delay):
+        """Send all commands of a sequence, spaced by delay seconds."""
+        loop = self.hass.loop
+        deadline = loop.time()
+        result = True
+
+        for _ in range(num_repeats):
+            for send in sends:
+                wait = deadline - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                result = await send() and result
+                # do not burst the remaining sends if a send took too long
+                deadline = max(deadline + delay, loop.time())
+
+        return result
+
+    async def async_stop(self):
+        """Stop the worker and drop all queued sequences."""
+        while not self._queue.empty():
+            _, _, _, future = self._queue.get_nowait()
+            future.cancel()
+
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
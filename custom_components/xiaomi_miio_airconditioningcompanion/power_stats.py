@@ -0,0 +1,198 @@
+"""Rolling statistics of the load power of the Xiaomi Air Conditioning Companion."""
+from array import array
+from collections import deque
+
+
+def parse_power_windows(value):
+    """Return the sorted windows in minutes of a comma separated list."""
+    windows = sorted({int(window) for window in str(value).split(",") if window.strip()})
+    if any(window <= 0 for window in windows):
+        raise ValueError("Windows must be positive: {}".format(value))
+    return windows
+
+
+class _RollingWindow:
+    """Mean, min and max of the samples of the last seconds.
+
+    The window refers to the samples of the ring buffer by their sequence
+    number. The time weighted area, a deque of candidate maxima and one of
+    candidate minima are updated incrementally, so adding a sample and
+    evicting the oldest ones costs amortized O(1). A sample is evicted
+    before the buffer overwrites it, as evicting reads its timestamp.
+    """
+
+    def __init__(self, buffer, seconds):
+        self._buffer = buffer
+        self.seconds = seconds
+        self._start = 0
+        self._area = 0.0
+        self._maxima = deque()
+        self._minima = deque()
+
+    def add(self, index):
+        """Include the sample index, the newest one of the buffer."""
+        value = self._buffer.value(index)
+        while self._maxima and self._buffer.value(self._maxima[-1]) <= value:
+            self._maxima.pop()
+        self._maxima.append(index)
+        while self._minima and self._buffer.value(self._minima[-1]) >= value:
+            self._minima.pop()
+        self._minima.append(index)
+        if index > self._start:
+            self._area += self._buffer.segment_area(index - 1)
+
+        limit = self._buffer.timestamp(index) - self.seconds
+        while self._start < index and self._buffer.timestamp(self._start) < limit:
+            self._evict()
+
+    def holds(self, index, timestamp):
+        """Return True if the sample index stays in the window at a new timestamp."""
+        return self._start <= index and self._buffer.timestamp(index) >= timestamp - self.seconds
+
+    def drop(self, index):
+        """Evict the samples up to index, the buffer overwrites them next."""
+        while self._start <= index:
+            self._evict()
+
+    def _evict(self):
+        """Drop the oldest sample of the window."""
+        if self._start < self._buffer.count - 1:
+            self._area -= self._buffer.segment_area(self._start)
+        if self._maxima[0] == self._start:
+            self._maxima.popleft()
+        if self._minima[0] == self._start:
+            self._minima.popleft()
+        self._start += 1
+
+    @property
+    def mean(self):
+        """Return the time weighted mean or None without samples."""
+        last = self._buffer.count - 1
+        if last < self._start:
+            return None
+        duration = self._buffer.timestamp(last) - self._buffer.timestamp(self._start)
+        if duration <= 0:
+            return self._buffer.value(last)
+        return self._area / duration
+
+    @property
+    def maximum(self):
+        """Return the largest sample or None without samples."""
+        if not self._maxima:
+            return None
+        return self._buffer.value(self._maxima[0])
+
+    @property
+    def minimum(self):
+        """Return the smallest sample or None without samples."""
+        if not self._minima:
+            return None
+        return self._buffer.value(self._minima[0])
+
+
+class XiaomiACPartnerPowerStatistics:
+    """Ring buffer of (timestamp, load power) samples of a device.
+
+    Timestamps and values are kept in two preallocated arrays of doubles.
+    Every configured window keeps its own rolling statistics over the
+    buffer. The buffer is sized by time: it doubles instead of overwriting
+    a sample which is still inside a window, so the windows cover their
+    full time however often the device is read.
+    """
+
+    def __init__(self, windows, capacity):
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.count = 0
+        self._windows = {seconds: _RollingWindow(self, seconds) for seconds in windows}
+
+    def timestamp(self, index):
+        """Return the timestamp of the sample index."""
+        return self.timestamps[index % self.capacity]
+
+    def value(self, index):
+        """Return the value of the sample index."""
+        return self.values[index % self.capacity]
+
+    def segment_area(self, index):
+        """Return the trapezoid area between the sample index and its successor."""
+        return (self.timestamp(index + 1) - self.timestamp(index)) * (
+            self.value(index) + self.value(index + 1)
+        ) / 2
+
+    def add(self, timestamp, value):
+        """Add a sample, the timestamps must not decrease."""
+        if self.count and timestamp < self.timestamp(self.count - 1):
+            timestamp = self.timestamp(self.count - 1)
+        index = self.count
+        if index >= self.capacity:
+            oldest = index - self.capacity
+            if any(window.holds(oldest, timestamp) for window in self._windows.values()):
+                self._grow()
+            else:
+                for window in self._windows.values():
+                    window.drop(oldest)
+        self.timestamps[index % self.capacity] = timestamp
+        self.values[index % self.capacity] = value
+        self.count += 1
+        for window in self._windows.values():
+            window.add(index)
+
+    def _grow(self):
+        """Double the capacity, keeping the samples at their sequence numbers."""
+        capacity = 2 * self.capacity
+        timestamps = array("d", bytes(8 * capacity))
+        values = array("d", bytes(8 * capacity))
+        for index in range(self.count - self.capacity, self.count):
+            timestamps[index % capacity] = self.timestamp(index)
+            values[index % capacity] = self.value(index)
+        self.capacity = capacity
+        self.timestamps = timestamps
+        self.values = values
+
+    @property
+    def windows(self):
+        """Return the configured windows in seconds."""
+        return list(self._windows)
+
+    def mean(self, seconds):
+        """Return the time weighted mean power of a window."""
+        return self._windows[seconds].mean
+
+    def maximum(self, seconds):
+        """Return the maximum power of a window."""
+        return self._windows[seconds].maximum
+
+    def minimum(self, seconds):
+        """Return the minimum power of a window."""
+        return self._windows[seconds].minimum
+
+
+class XiaomiACPartnerEnergyMeter:
+    """Energy in kWh integrated from the load power samples of a device.
+
+    Every sample adds the trapezoid between it and the previous one, so
+    faster polling directly improves the accuracy.
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self._last = None
+        self._restored = False
+
+    def add(self, timestamp, value):
+        """Integrate the load power up to the sample."""
+        if self._last is not None:
+            last_timestamp, last_value = self._last
+            if timestamp > last_timestamp:
+                self.total += (
+                    (timestamp - last_timestamp) * (last_value + value) / 2 / 3600000
+                )
+        self._last = (timestamp, value)
+
+    def restore(self, total):
+        """Continue counting from the total of a previous run, only once."""
+        if not self._restored:
+            self.total += total
+            self._restored = True
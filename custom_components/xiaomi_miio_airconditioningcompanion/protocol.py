@@ -0,0 +1,560 @@
+"""Asyncio miIO client of the Xiaomi Air Conditioning Companion component."""
+# pylint: disable=import-error
+import asyncio
+import hashlib
+import json
+import logging
+import struct
+import time
+from functools import lru_cache
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from miio import DeviceError, DeviceException, DeviceInfo
+from miio.airconditioningcompanion import (
+    DEVICE_COMMAND_TEMPLATES,
+    POWER_OFF,
+    AirConditioningCompanionException,
+    AirConditioningCompanionStatus,
+    FanSpeed,
+    Led,
+    OperationMode,
+    Power,
+    SwingMode
+)
+from miio.exceptions import RecoverableError
+
+from .circuit_breaker import XiaomiACPartnerCircuitBreaker
+from .const import (
+    CONFIGURATION_CACHE_SIZE,
+    MIIO_COMMAND_MIN_TIMEOUT,
+    MIIO_MIN_TIMEOUT,
+    MIIO_PORT,
+    MIIO_RETRY_COUNT,
+    MIIO_TIMEOUT,
+    MODEL_LUMI_ACPARTNER_V2,
+    MODEL_LUMI_ACPARTNER_V3,
+    SESSION_REQUEST_ID_STEP
+)
+from .metrics import XiaomiACPartnerMetrics
+from .rtt import XiaomiACPartnerRttEstimator
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = 0x2131
+HEADER = struct.Struct(">HHI4sI")
+HEADER_LENGTH = 32
+HELLO = bytes.fromhex("21310020" + "ff" * 28)
+RECOVERABLE_ERRORS = [-30001, -9999]
+# method name of the handshake in the metrics
+HANDSHAKE = "hello"
+# requests without side effects, resent at once if a reply is lost
+IDEMPOTENT_REQUESTS = [
+    HANDSHAKE,
+    "get_device_prop",
+    "get_ir_learn_result",
+    "get_model_and_state",
+    "get_prop",
+    "miIO.info",
+]
+
+
+def _md5(data: bytes) -> bytes:
+    """Return the md5 digest of data."""
+    return hashlib.md5(data).digest()  # nosec
+
+
+# pylint: disable=too-many-arguments
+@lru_cache(maxsize=CONFIGURATION_CACHE_SIZE)
+def encode_configuration(
+    model: str,
+    power: Power,
+    operation_mode: OperationMode,
+    target_temperature: int,
+    fan_speed: FanSpeed,
+    swing_mode: SwingMode,
+    led: Led,
+) -> str:
+    """Return the configuration command of a state of the air conditioner.
+
+    The commands are built from the templates of python-miio. The result
+    only depends on the arguments, so the commands of recently used states
+    are cached.
+    """
+    prefix = str(model[0:2] + model[8:16])
+    suffix = model[-1:]
+
+    # Static turn off command available?
+    if (
+        power is Power.Off
+        and prefix in DEVICE_COMMAND_TEMPLATES
+        and POWER_OFF in DEVICE_COMMAND_TEMPLATES[prefix]
+    ):
+        return prefix + DEVICE_COMMAND_TEMPLATES[prefix][POWER_OFF]
+
+    if prefix in DEVICE_COMMAND_TEMPLATES:
+        configuration = prefix + DEVICE_COMMAND_TEMPLATES[prefix]["base"]
+    else:
+        configuration = prefix + DEVICE_COMMAND_TEMPLATES["fallback"]["base"]
+
+    configuration = configuration.replace("[po]", str(power.value))
+    configuration = configuration.replace("[mo]", str(operation_mode.value))
+    configuration = configuration.replace("[wi]", str(fan_speed.value))
+    configuration = configuration.replace("[sw]", str(swing_mode.value))
+    configuration = configuration.replace("[tt]", format(target_temperature, "X"))
+    configuration = configuration.replace("[li]", str(led.value))
+    configuration = configuration.replace(
+        "[tt1]", format((1 + target_temperature - 17) % 16, "X"))
+    configuration = configuration.replace(
+        "[tt4]", format((4 + target_temperature - 17) % 16, "X"))
+    configuration = configuration.replace(
+        "[tt7]", format((7 + target_temperature - 17) % 16, "X"))
+
+    return configuration + suffix
+
+
+class _MiioCipher:
+    """AES-128-CBC cipher derived from a device token."""
+
+    def __init__(self, token: bytes):
+        self._key = _md5(token)
+        self._iv = _md5(self._key + token)
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        """Encrypt a payload."""
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(plaintext) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(self._key), modes.CBC(self._iv)).encryptor()
+        return encryptor.update(padded) + encryptor.finalize()
+
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        """Decrypt a payload."""
+        decryptor = Cipher(algorithms.AES(self._key), modes.CBC(self._iv)).decryptor()
+        padded = decryptor.update(ciphertext) + decryptor.finalize()
+        unpadder = padding.PKCS7(128).unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+
+
+class _MiioDatagramProtocol(asyncio.DatagramProtocol):
+    """Forward the datagrams of a device socket to its client."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def datagram_received(self, data, addr):
+        self._client.datagram_received(data)
+
+    def error_received(self, exc):
+        _LOGGER.debug("Error received from %s: %s", self._client.host, exc)
+
+    def connection_lost(self, exc):
+        self._client.connection_lost(exc)
+
+
+class XiaomiACPartnerClient:
+    """Asyncio implementation of the miIO protocol for an acpartner.
+
+    All requests of a device share one UDP socket. Replies are matched to
+    the pending requests by their id, so any number of requests can be in
+    flight without occupying a thread.
+
+    The timeout of a request adapts to the round trip times measured for
+    its method, so a lost datagram of a fast device is retried quickly.
+    Only idempotent requests are retried after a timeout, a command may
+    have been executed although its reply was lost. Commands wait at least
+    MIIO_COMMAND_MIN_TIMEOUT seconds for the reply.
+
+    A session is discovered again when a request is left without any reply
+    and the device has not replied since the session was restored or since
+    the last request without reply, f.e. after the device was reset.
+    """
+
+    def __init__(self, host, token, model=MODEL_LUMI_ACPARTNER_V2,
+                 timeout=MIIO_TIMEOUT, retry_count=MIIO_RETRY_COUNT):
+        self.host = host
+        self.model = model
+        self._token = bytes.fromhex(token)
+        self._cipher = _MiioCipher(self._token)
+        self._timeout = timeout
+        self._estimators = {}
+        self._retry_count = retry_count
+        self._transport = None
+        self._pending = {}
+        self._handshake_future = None
+        self._handshake_lock = asyncio.Lock()
+        self._transport_lock = asyncio.Lock()
+        self._request_id = 0
+        self._device_id = bytes(4)
+        self._stamp_offset = 0
+        self._discovered = False
+        # the device replied since the session was started or the last lost request
+        self._replied = False
+        # called after a handshake changed the session
+        self.session_listener = None
+        self.metrics = XiaomiACPartnerMetrics()
+        self.circuit_breaker = XiaomiACPartnerCircuitBreaker()
+
+    @property
+    def session(self):
+        """Return the session state to persist or None before the first handshake."""
+        if not self._discovered:
+            return None
+        return {
+            "device_id": self._device_id.hex(),
+            "stamp_offset": self._stamp_offset,
+            "request_id": self._request_id,
+        }
+
+    def restore_session(self, device_id, stamp_offset, request_id=0):
+        """Continue a session of an earlier run without a handshake.
+
+        The request id continues a step after the stored one, as ids sent
+        after the session was stored would be dropped as duplicates.
+        """
+        self._device_id = bytes.fromhex(device_id)
+        if len(self._device_id) != 4:
+            raise ValueError("Invalid device id {}".format(device_id))
+        self._stamp_offset = int(stamp_offset)
+        self._request_id = (int(request_id) + SESSION_REQUEST_ID_STEP) % 9999
+        self._discovered = True
+        self._replied = False
+
+    async def _async_ensure_transport(self):
+        """Open the UDP socket of the device."""
+        if self._transport is not None:
+            return
+
+        async with self._transport_lock:
+            if self._transport is not None:
+                return
+
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _MiioDatagramProtocol(self), remote_addr=(self.host, MIIO_PORT)
+            )
+
+    async def async_close(self):
+        """Close the socket and fail all pending requests."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._fail_pending(DeviceException("Connection closed"))
+
+    def connection_lost(self, exc):
+        """Handle a closed socket, the session stays valid."""
+        self._transport = None
+        self._fail_pending(DeviceException("Connection lost: {}".format(exc)))
+
+    def _fail_pending(self, exc):
+        """Fail all requests waiting for a reply."""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self._pending.clear()
+
+    def _estimator(self, method):
+        """Return the round trip time estimator of a method."""
+        if method not in self._estimators:
+            min_timeout = (
+                MIIO_MIN_TIMEOUT if method in IDEMPOTENT_REQUESTS
+                else MIIO_COMMAND_MIN_TIMEOUT
+            )
+            self._estimators[method] = XiaomiACPartnerRttEstimator(
+                min_timeout=min(min_timeout, self._timeout), max_timeout=self._timeout
+            )
+        return self._estimators[method]
+
+    @property
+    def request_timeouts(self):
+        """Return the round trip times and timeouts by method."""
+        return {
+            method: estimator.as_dict() for method, estimator in self._estimators.items()
+        }
+
+    def _next_id(self):
+        """Increment and return the request id."""
+        self._request_id += 1
+        if self._request_id >= 9999:
+            self._request_id = 1
+        return self._request_id
+
+    def datagram_received(self, data):
+        """Match a reply of the device to its pending request."""
+        if len(data) < HEADER_LENGTH:
+            _LOGGER.debug("Ignoring short datagram from %s", self.host)
+            return
+
+        magic, length, _, device_id, stamp = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            _LOGGER.debug("Ignoring datagram with invalid magic from %s", self.host)
+            return
+
+        if length == HEADER_LENGTH:
+            future = self._handshake_future
+            if future is not None and not future.done():
+                future.set_result((device_id, stamp))
+            return
+
+        if _md5(data[:16] + self._token + data[HEADER_LENGTH:]) != data[16:HEADER_LENGTH]:
+            self._fail_pending(DeviceException(
+                "Got checksum error which indicates use "
+                "of an invalid token. "
+                "Please check your token!"
+            ))
+            return
+
+        try:
+            payload = json.loads(
+                self._cipher.decrypt(data[HEADER_LENGTH:length]).rstrip(b"\x00")
+            )
+        except ValueError as ex:
+            _LOGGER.debug("Unable to decode the reply of %s: %s", self.host, ex)
+            return
+
+        if device_id != self._device_id:
+            # the session belongs to another device, f.e. after a replacement
+            _LOGGER.debug("Session of %s is invalid, discovering again", self.host)
+            self._discovered = False
+        self._stamp_offset = stamp - int(time.time())
+        self._replied = True
+        future = self._pending.pop(payload.get("id"), None)
+        if future is not None and not future.done():
+            future.set_result(payload)
+
+    async def _async_handshake(self):
+        """Discover the device id and time stamp of the device."""
+        async with self._handshake_lock:
+            if self._discovered:
+                return
+
+            await self._async_ensure_transport()
+            loop = asyncio.get_running_loop()
+            estimator = self._estimator(HANDSHAKE)
+            for _ in range(self._retry_count + 1):
+                self._handshake_future = loop.create_future()
+                sent = loop.time()
+                self._transport.sendto(HELLO)
+                try:
+                    device_id, stamp = await asyncio.wait_for(
+                        self._handshake_future, estimator.timeout
+                    )
+                except asyncio.TimeoutError:
+                    estimator.backoff()
+                    self.metrics.record_timeout(HANDSHAKE)
+                    continue
+                finally:
+                    self._handshake_future = None
+
+                estimator.add_sample(loop.time() - sent)
+
+                self._device_id = device_id
+                self._stamp_offset = stamp - int(time.time())
+                self._discovered = True
+                self._replied = True
+                _LOGGER.debug(
+                    "Discovered %s with device id %s", self.host, device_id.hex()
+                )
+                if self.session_listener is not None:
+                    self.session_listener()
+                return
+
+        raise DeviceException("Unable to discover the device {}".format(self.host))
+
+    def _build_message(self, request):
+        """Encrypt and sign a request."""
+        data = self._cipher.encrypt(json.dumps(request).encode("utf-8") + b"\x00")
+        stamp = (int(time.time()) + self._stamp_offset + 1) & 0xFFFFFFFF
+        header = HEADER.pack(MAGIC, HEADER_LENGTH + len(data), 0, self._device_id, stamp)
+        return header + _md5(header + self._token + data) + data
+
+    async def send(self, command, parameters=None):
+        """Send a command and return the result of the device."""
+        if not self.circuit_breaker.allow_request():
+            raise DeviceException(
+                "{} is unreachable, not sending {}".format(self.host, command)
+            )
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            result = await self._async_send(command, parameters)
+        except DeviceError as ex:
+            # the device replied, if only with an error
+            self.circuit_breaker.record_success()
+            self.metrics.record_error(command, ex)
+            raise
+        except DeviceException as ex:
+            self.circuit_breaker.record_failure()
+            self.metrics.record_error(command, ex)
+            raise
+        self.circuit_breaker.record_success()
+        self.metrics.record_success(command, loop.time() - start)
+        return result
+
+    async def _async_send(self, command, parameters):
+        """Send a command with retries and return the result of the device."""
+        loop = asyncio.get_running_loop()
+        error = None
+        timed_out = False
+
+        for _ in range(self._retry_count + 1):
+            if not self._discovered:
+                await self._async_handshake()
+            else:
+                await self._async_ensure_transport()
+
+            request_id = self._next_id()
+            request = {
+                "id": request_id,
+                "method": command,
+                "params": parameters if parameters is not None else [],
+            }
+            future = loop.create_future()
+            self._pending[request_id] = future
+            _LOGGER.debug("%s >>: %s", self.host, request)
+
+            estimator = self._estimator(command)
+            timed_out = False
+            try:
+                sent = loop.time()
+                self._transport.sendto(self._build_message(request))
+                payload = await asyncio.wait_for(future, estimator.timeout)
+            except asyncio.TimeoutError:
+                estimator.backoff()
+                self.metrics.record_timeout(command)
+                error = DeviceException("No response from the device")
+                timed_out = True
+                if command not in IDEMPOTENT_REQUESTS:
+                    break
+                continue
+            finally:
+                self._pending.pop(request_id, None)
+
+            # every attempt has its own id, so the reply belongs to this one
+            estimator.add_sample(loop.time() - sent)
+            _LOGGER.debug("%s <<: %s", self.host, payload)
+            if "error" in payload:
+                payload_error = payload["error"]
+                if (
+                    isinstance(payload_error, dict)
+                    and payload_error.get("code") in RECOVERABLE_ERRORS
+                ):
+                    error = RecoverableError(payload_error)
+                    continue
+                raise DeviceError(payload_error)
+
+            return payload.get("result", payload)
+
+        if timed_out:
+            self._session_timed_out()
+        raise DeviceException("Unable to send {} to {}: {}".format(command, self.host, error))
+
+    def _session_timed_out(self):
+        """Discover the device again if the session got no reply for too long."""
+        if self._replied:
+            self._replied = False
+            return
+
+        if self._discovered:
+            # f.e. a restored session the device no longer accepts
+            _LOGGER.debug("No reply to the session of %s, discovering again", self.host)
+            self._discovered = False
+            if self.session_listener is not None:
+                self.session_listener()
+
+    async def info(self):
+        """Return the device info."""
+        return DeviceInfo(await self.send("miIO.info"))
+
+    async def status(self):
+        """Return the device status."""
+        status = await self.send("get_model_and_state")
+        data = {"model_and_state": status}
+        if self.model == MODEL_LUMI_ACPARTNER_V3:
+            power_socket = await self.send("get_device_prop", ["lumi.0", "plug_state"])
+            data["power_socket"] = power_socket[0]
+        return AirConditioningCompanionStatus(data)
+
+    async def get_properties(self, properties):
+        """Return the values of a list of properties read in one request."""
+        return await self.send("get_prop", properties)
+
+    async def on(self):
+        """Turn the air condition on by infrared."""
+        return await self.send("set_power", ["on"])
+
+    async def off(self):
+        """Turn the air condition off by infrared."""
+        return await self.send("set_power", ["off"])
+
+    async def learn(self, slot):
+        """Learn an infrared command."""
+        return await self.send("start_ir_learn", [slot])
+
+    async def learn_result(self):
+        """Read the learned command."""
+        return await self.send("get_ir_learn_result")
+
+    async def learn_stop(self, slot):
+        """Stop learning of a infrared command."""
+        return await self.send("end_ir_learn", [slot])
+
+    async def send_command(self, command):
+        """Send a command to the air conditioner."""
+        return await self.send("send_cmd", [str(command)])
+
+    async def send_ir_code(self, model, code, slot=0):
+        """Play a captured command."""
+        try:
+            model_bytes = bytes.fromhex(model)
+        except ValueError as ex:
+            raise AirConditioningCompanionException(
+                "Invalid model. A hexadecimal string must be provided"
+            ) from ex
+
+        try:
+            code_bytes = bytes.fromhex(code)
+        except ValueError as ex:
+            raise AirConditioningCompanionException(
+                "Invalid code. A hexadecimal string must be provided"
+            ) from ex
+
+        if slot < 0 or slot > 134:
+            raise AirConditioningCompanionException("Invalid slot: %s" % slot)
+
+        command_bytes = (
+            code_bytes[0:1]
+            + model_bytes[2:8]
+            + b"\x94\x70\x1F\xFF"
+            + bytes([121 + slot])
+            + b"\xFF"
+            + code_bytes[13:16]
+            + b"\x27"
+        )
+        checksum = sum(command_bytes) & 0xFF
+        command_bytes = command_bytes + bytes([checksum]) + code_bytes[18:]
+
+        return await self.send("send_ir_code", [command_bytes.hex().upper()])
+
+    async def send_configuration(
+        self,
+        model: str,
+        power: Power,
+        operation_mode: OperationMode,
+        target_temperature: int,
+        fan_speed: FanSpeed,
+        swing_mode: SwingMode,
+        led: Led,
+    ):
+        """Send a configuration to the air conditioner."""
+        return await self.send_command(
+            encode_configuration(
+                model,
+                power,
+                operation_mode,
+                target_temperature,
+                fan_speed,
+                swing_mode,
+                led,
+            )
+        )
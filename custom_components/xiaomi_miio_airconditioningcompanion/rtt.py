@@ -0,0 +1,38 @@
+"""Round trip time estimation of the Xiaomi Air Conditioning Companion component."""
+from .const import MIIO_MIN_TIMEOUT, MIIO_TIMEOUT, RTT_CLOCK_GRANULARITY
+
+
+class XiaomiACPartnerRttEstimator:
+    """Request timeout derived from the measured round trip times like TCP.
+
+    The smoothed round trip time and its variance are updated with every
+    reply as in RFC 6298, the timeout is the smoothed round trip time plus
+    four times the variance. A timeout doubles the timeout until the next
+    reply.
+    """
+
+    def __init__(self, min_timeout=MIIO_MIN_TIMEOUT, max_timeout=MIIO_TIMEOUT):
+        self._min_timeout = min_timeout
+        self._max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+        self.timeout = max_timeout
+
+    def add_sample(self, rtt):
+        """Update the timeout with the round trip time of a reply."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        timeout = self.srtt + max(RTT_CLOCK_GRANULARITY, 4 * self.rttvar)
+        self.timeout = min(max(timeout, self._min_timeout), self._max_timeout)
+
+    def backoff(self):
+        """Double the timeout after a request without reply."""
+        self.timeout = min(self.timeout * 2, self._max_timeout)
+
+    def as_dict(self):
+        """Return the state of the estimator."""
+        return {"srtt": self.srtt, "rttvar": self.rttvar, "timeout": self.timeout}
@@ -0,0 +1,157 @@
+"""Schedules of the Xiaomi Air Conditioning Companion component."""
+import heapq
+import itertools
+import logging
+import uuid
+from datetime import datetime, time, timedelta
+
+from homeassistant.const import WEEKDAYS
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+import homeassistant.util.dt as dt_util
+
+from .storage import XiaomiACPartnerScheduleStore
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_SCHEDULE_ID = "schedule_id"
+ATTR_TIME = "time"
+ATTR_WEEKDAYS = "weekdays"
+
+
+def next_fire_time(schedule, now):
+    """Return the next local time after now the schedule fires at as UTC."""
+    at = time.fromisoformat(schedule[ATTR_TIME])
+    for days in range(8):
+        day = now.date() + timedelta(days=days)
+        if WEEKDAYS[day.weekday()] not in schedule[ATTR_WEEKDAYS]:
+            continue
+        when = datetime.combine(day, at, tzinfo=now.tzinfo)
+        if when > now:
+            return dt_util.as_utc(when)
+    return None
+
+
+class XiaomiACPartnerScheduler:
+    """Fire the schedules of all climate entities from a single timer.
+
+    The next firing of every schedule is kept in one min-heap, the timer
+    is set for the earliest one only. A firing pops its entry and pushes
+    the following one, so it costs O(log n) however many schedules
+    exist. Removed schedules are only marked in the heap and dropped when
+    they reach the top.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        self._store = XiaomiACPartnerScheduleStore(hass)
+        self._heap = []
+        # heap entry of every schedule of a registered entity
+        self._entries = {}
+        self._entities = {}
+        self._counter = itertools.count()
+        self._unsub_timer = None
+        self._timer_at = None
+
+    async def async_load(self):
+        """Load the stored schedules."""
+        await self._store.async_load()
+
+    @callback
+    def async_schedules(self, device_id):
+        """Return the schedules of a device by id."""
+        return self._store.async_get(device_id)
+
+    @callback
+    def async_add(self, device_id, schedule):
+        """Store a new schedule of a device and return its id."""
+        schedule_id = uuid.uuid4().hex
+        self._store.async_set(device_id, schedule_id, schedule)
+        if device_id in self._entities:
+            self._async_push(device_id, schedule_id, dt_util.now())
+            self._async_update_timer()
+        return schedule_id
+
+    @callback
+    def async_delete(self, device_id, schedule_id):
+        """Remove a schedule and return True if it existed."""
+        self._async_drop(device_id, schedule_id)
+        if not self._store.async_delete(device_id, schedule_id):
+            return False
+        self._async_update_timer()
+        return True
+
+    @callback
+    def async_remove_device(self, device_id):
+        """Remove all schedules of a device."""
+        self._store.async_remove_device(device_id)
+
+    @callback
+    def async_register(self, device_id, entity):
+        """Fire the schedules of a device on the entity from now on."""
+        self._entities[device_id] = entity
+        now = dt_util.now()
+        for schedule_id in self._store.async_get(device_id):
+            self._async_push(device_id, schedule_id, now)
+        self._async_update_timer()
+
+    @callback
+    def async_unregister(self, device_id):
+        """Stop firing the schedules of a device."""
+        if self._entities.pop(device_id, None) is None:
+            return
+        for schedule_id in self._store.async_get(device_id):
+            self._async_drop(device_id, schedule_id)
+        self._async_update_timer()
+
+    @callback
+    def _async_push(self, device_id, schedule_id, now):
+        """Add the next firing of a schedule to the heap."""
+        when = next_fire_time(self._store.async_get(device_id)[schedule_id], now)
+        if when is None:
+            return
+        entry = [when, next(self._counter), device_id, schedule_id]
+        self._entries[(device_id, schedule_id)] = entry
+        heapq.heappush(self._heap, entry)
+
+    @callback
+    def _async_drop(self, device_id, schedule_id):
+        """Mark the heap entry of a schedule as removed."""
+        entry = self._entries.pop((device_id, schedule_id), None)
+        if entry is not None:
+            entry[-1] = None
+
+    @callback
+    def _async_update_timer(self):
+        """Set the timer for the earliest firing."""
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+        when = self._heap[0][0] if self._heap else None
+        if when == self._timer_at:
+            return
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self._timer_at = when
+        if when is not None:
+            self._unsub_timer = async_track_point_in_utc_time(
+                self.hass, self._async_fire, when
+            )
+
+    @callback
+    def _async_fire(self, utcnow):
+        """Fire all schedules which are due and set the timer for the next."""
+        self._unsub_timer = None
+        self._timer_at = None
+        now = dt_util.as_local(utcnow)
+        while self._heap and self._heap[0][0] <= utcnow:
+            _, _, device_id, schedule_id = heapq.heappop(self._heap)
+            if schedule_id is None:
+                continue
+            schedule = self._store.async_get(device_id)[schedule_id]
+            _LOGGER.debug("Firing schedule %s of %s", schedule_id, device_id)
+            self.hass.async_create_task(
+                self._entities[device_id].async_run_schedule(schedule)
+            )
+            self._async_push(device_id, schedule_id, now)
+        self._async_update_timer()
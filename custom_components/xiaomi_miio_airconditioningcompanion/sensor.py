@@ -1,30 +1,42 @@
 """Sensor of the Xiaomi Air Conditioning Companion component."""
 import logging
-from datetime import timedelta
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    RestoreSensor,
+    SensorEntity,
+    SensorStateClass
+)
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.const import (
     CONF_HOST,
-    CONF_MAC
+    CONF_MAC,
+    POWER_WATT
 )
-from miio import DeviceException
 
 from .const import (
+    ATTR_LOAD_POWER,
+    CONF_FIRMWARE_VERSION,
+    CONF_HARDWARE_VERSION,
     CONF_MODEL,
+    DATA_COORDINATOR,
+    DATA_DEVICE,
     DOMAIN,
     ACPARTNER_SENSORS,
+    ENERGY_SENSOR,
+    ENERGY_UPDATE_INTERVAL,
+    METRIC_SENSORS,
     MODELS_MIIO,
+    POWER_STATISTICS,
     XiaomiACPartnerSensorDescription
 )
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(seconds=60)
-
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigType, async_add_entities: AddEntitiesCallback
 ) -> None:
@@ -35,7 +47,8 @@ async def async_setup_entry(
     name = entry.title
     unique_id = entry.unique_id
 
-    acpartner = hass.data[DOMAIN][host]
+    acpartner = hass.data[DOMAIN][host][DATA_DEVICE]
+    coordinator = hass.data[DOMAIN][host][DATA_COORDINATOR]
 
     try:
         entities = []
@@ -43,18 +56,40 @@ async def async_setup_entry(
         for description in ACPARTNER_SENSORS:
             if model in MODELS_MIIO:
                 entities.extend(
-                    [XiaomiACPartnerSensor(entry.options, description, name, unique_id, acpartner)]
+                    [XiaomiACPartnerSensor(
+                        coordinator, entry.options, description, name, unique_id, acpartner)]
                 )
 
+        if model in MODELS_MIIO:
+            entities.append(XiaomiACPartnerEnergySensor(
+                coordinator, entry.options, ENERGY_SENSOR, name, unique_id, acpartner))
+            for description in METRIC_SENSORS:
+                entities.append(XiaomiACPartnerMetricSensor(
+                    coordinator, entry.options, description, name, unique_id, acpartner))
+            for seconds in coordinator.power_statistics.windows:
+                for statistic, statistic_name in POWER_STATISTICS.items():
+                    description = XiaomiACPartnerSensorDescription(
+                        key="{}_{}_{}m".format(ATTR_LOAD_POWER, statistic, seconds // 60),
+                        name="Load Power {} {} min".format(statistic_name, seconds // 60),
+                        native_unit_of_measurement=POWER_WATT,
+                        state_class=SensorStateClass.MEASUREMENT,
+                        icon="mdi:flash",
+                        properties=(ATTR_LOAD_POWER,)
+                    )
+                    entities.append(XiaomiACPartnerPowerStatisticSensor(
+                        coordinator, entry.options, description, name, unique_id, acpartner,
+                        statistic, seconds))
+
         async_add_entities(entities)
     except AttributeError as ex:
         _LOGGER.error(ex)
 
-class XiaomiACPartnerSensor(SensorEntity):
+class XiaomiACPartnerSensor(CoordinatorEntity, SensorEntity):
     """Implementation of a Xiaomi Air Conditioning Companion sensor."""
     entity_description: XiaomiACPartnerSensorDescription
 
-    def __init__(self, entry_data, description, name, unique_id, acpartner):
+    def __init__(self, coordinator, entry_data, description, name, unique_id, acpartner):
+        super().__init__(coordinator, context=description.properties)
         self.entity_description = description
         self._entry_data = entry_data
         self._name = name
@@ -64,8 +99,6 @@ class XiaomiACPartnerSensor(SensorEntity):
         self._mac = entry_data[CONF_MAC]
         self._host = entry_data[CONF_HOST]
         self._acpartner = acpartner
-        self._available = True
-        self._skip_update = False
         self._state = None
         self._attr_native_unit_of_measurement = description.native_unit_of_measurement
         self._attr_device_class = description.device_class
@@ -88,14 +121,13 @@ class XiaomiACPartnerSensor(SensorEntity):
     @property
     def device_info(self):
         """Return the device info."""
-        info = self._acpartner.info()
         device_info = {
             "identifiers": {(DOMAIN, self._unique_id)},
             "manufacturer": (self._model or "Xiaomi").split(".", 1)[0].capitalize(),
             "name": self._name,
             "model": self._model,
-            "sw_version": info.firmware_version,
-            "hw_version": info.hardware_version
+            "sw_version": self._entry_data.get(CONF_FIRMWARE_VERSION),
+            "hw_version": self._entry_data.get(CONF_HARDWARE_VERSION)
         }
 
         if self._mac is not None:
@@ -108,19 +140,108 @@ class XiaomiACPartnerSensor(SensorEntity):
         """Return the state of the sensor."""
         return self._state
 
-    async def async_update(self):
-        """Fetch state from the device."""
-        # On state change the device doesn't provide the new state immediately.
-        if self._skip_update:
-            self._skip_update = False
-            return
-
-        try:
-            state = await self.hass.async_add_executor_job(self._acpartner.status)
-            self._state = getattr(state, self._attr)
-            _LOGGER.debug("Got new state: %s", state)
-
-        except DeviceException as ex:
-            if self._available:
-                self._available = False
-                _LOGGER.error("Got exception while fetching the state: %s", ex)
+    def _value(self):
+        """Return the value of the sensor from the coordinator data."""
+        return self.coordinator.data.get(self._attr)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        if self.coordinator.data is not None:
+            self._state = self._value()
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        """Run when entity about to be added."""
+        await super().async_added_to_hass()
+        if self.coordinator.data is not None:
+            self._state = self._value()
+
+
+class XiaomiACPartnerPowerStatisticSensor(XiaomiACPartnerSensor):
+    """Rolling mean, max or min of the load power over a window."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, coordinator, entry_data, description, name, unique_id, acpartner,
+                 statistic, window):
+        super().__init__(coordinator, entry_data, description, name, unique_id, acpartner)
+        self._statistic = statistic
+        self._window = window
+
+    def _value(self):
+        """Return the statistic of the load power samples."""
+        power_statistics = self.coordinator.power_statistics
+        if self._statistic == "mean":
+            value = power_statistics.mean(self._window)
+            return round(value, 1) if value is not None else None
+        if self._statistic == "max":
+            return power_statistics.maximum(self._window)
+        return power_statistics.minimum(self._window)
+
+
+class XiaomiACPartnerMetricSensor(XiaomiACPartnerSensor):
+    """Request metric of the device, updated with every poll."""
+
+    @property
+    def available(self):
+        """Return True, the metrics are known also if the device is unreachable."""
+        return True
+
+    def _value(self):
+        """Return the metric of the requests to the device."""
+        return getattr(self._acpartner.metrics, self._attr)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator, also after a failed poll."""
+        self._state = self._value()
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        """Run when entity about to be added."""
+        await super().async_added_to_hass()
+        self._state = self._value()
+
+
+class XiaomiACPartnerEnergySensor(XiaomiACPartnerSensor, RestoreSensor):
+    """Energy consumption integrated from the load power.
+
+    The total is restored after a restart. Its state is written at most
+    once per ENERGY_UPDATE_INTERVAL, however often the device is polled.
+    """
+
+    def __init__(self, coordinator, entry_data, description, name, unique_id, acpartner):
+        super().__init__(coordinator, entry_data, description, name, unique_id, acpartner)
+        self._write_debouncer = Debouncer(
+            coordinator.hass,
+            _LOGGER,
+            cooldown=ENERGY_UPDATE_INTERVAL,
+            immediate=True,
+            function=self.async_write_ha_state,
+        )
+
+    def _value(self):
+        """Return the energy integrated so far."""
+        return round(self.coordinator.energy_meter.total, 4)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update the total and write it at a bounded rate."""
+        self._state = self._value()
+        self.hass.async_create_task(self._write_debouncer.async_call())
+
+    async def async_added_to_hass(self):
+        """Restore the total of the previous run."""
+        last_sensor_data = await self.async_get_last_sensor_data()
+        if last_sensor_data is not None and last_sensor_data.native_value is not None:
+            try:
+                self.coordinator.energy_meter.restore(float(last_sensor_data.native_value))
+            except (TypeError, ValueError) as ex:
+                _LOGGER.debug("Unable to restore the energy of %s: %s", self._name, ex)
+        await super().async_added_to_hass()
+        self._state = self._value()
+
+    async def async_will_remove_from_hass(self):
+        """Cancel a pending state write."""
+        self._write_debouncer.async_cancel()
+        await super().async_will_remove_from_hass()
@@ -0,0 +1,218 @@
+"""Persistent storage of the Xiaomi Air Conditioning Companion component."""
+import asyncio
+import logging
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+CODES_STORAGE_KEY = "{}.codes".format(DOMAIN)
+SESSIONS_STORAGE_KEY = "{}.sessions".format(DOMAIN)
+SCHEDULES_STORAGE_KEY = "{}.schedules".format(DOMAIN)
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+
+class _XiaomiACPartnerStore:
+    """Base class of the stores, loaded once and kept in memory."""
+
+    def __init__(self, hass: HomeAssistant, key):
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, key)
+        self._lock = asyncio.Lock()
+        self._loaded = False
+
+    async def async_load(self):
+        """Load the data once, concurrent callers wait for the same load."""
+        async with self._lock:
+            if self._loaded:
+                return
+            data = await self._store.async_load()
+            if data is not None:
+                self._async_loaded(data)
+            self._loaded = True
+
+    @callback
+    def _async_loaded(self, data):
+        """Take over the stored data."""
+        raise NotImplementedError
+
+    @callback
+    def _data_to_save(self):
+        """Return the data to store."""
+        raise NotImplementedError
+
+    @callback
+    def _async_schedule_save(self):
+        """Write the data after a short delay, merging writes in the meantime."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+
+class XiaomiACPartnerCodeStore(_XiaomiACPartnerStore):
+    """Persist learned infrared codes by device and name.
+
+    All codes are kept in memory as a dict of dicts, so resolving a name is
+    a single lookup. Changes are written to disk with a short delay, which
+    merges the writes of several learned codes into one.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        super().__init__(hass, CODES_STORAGE_KEY)
+        self._codes = {}
+
+    @callback
+    def _async_loaded(self, data):
+        """Take over the stored codes."""
+        self._codes = data.get("codes", {})
+
+    @callback
+    def _data_to_save(self):
+        """Return the data to store."""
+        return {"codes": self._codes}
+
+    @callback
+    def async_get(self, device_id, name):
+        """Return the code learned under name or None."""
+        return self._codes.get(device_id, {}).get(name)
+
+    @callback
+    def async_names(self, device_id):
+        """Return the names of all codes of a device."""
+        return sorted(self._codes.get(device_id, {}))
+
+    @callback
+    def async_set(self, device_id, name, code):
+        """Store a code under name, replacing a previous one."""
+        self._codes.setdefault(device_id, {})[name] = code
+        self._async_schedule_save()
+
+    @callback
+    def async_delete(self, device_id, name):
+        """Remove a code and return True if it existed."""
+        codes = self._codes.get(device_id, {})
+        if codes.pop(name, None) is None:
+            return False
+        if not codes:
+            self._codes.pop(device_id, None)
+        self._async_schedule_save()
+        return True
+
+    @callback
+    def async_remove_device(self, device_id):
+        """Remove all codes of a device."""
+        if self._codes.pop(device_id, None) is not None:
+            self._async_schedule_save()
+
+
+class XiaomiACPartnerSessionStore(_XiaomiACPartnerStore):
+    """Persist the miIO session of every host across restarts.
+
+    A restored session lets the first request after a restart go out
+    without a handshake. The sessions of the registered clients are
+    collected when the data is written, so the latest request ids are
+    stored without a write per request. A write is scheduled on stop, it
+    is completed by the final write of Home Assistant.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        super().__init__(hass, SESSIONS_STORAGE_KEY)
+        self._sessions = {}
+        self._clients = {}
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_stop)
+
+    @callback
+    def _async_stop(self, _event: Event):
+        """Store the latest request ids of all clients."""
+        if self._clients:
+            self._async_schedule_save()
+
+    @callback
+    def _async_loaded(self, data):
+        """Take over the stored sessions."""
+        self._sessions = data.get("sessions", {})
+
+    @callback
+    def _data_to_save(self):
+        """Return the sessions of all hosts."""
+        for host, client in self._clients.items():
+            session = client.session
+            if session is not None:
+                self._sessions[host] = session
+            else:
+                # not discovered yet or the stored session was not accepted
+                self._sessions.pop(host, None)
+        return {"sessions": self._sessions}
+
+    @callback
+    def async_restore(self, client):
+        """Restore the stored session of a client and track its changes."""
+        session = self._sessions.get(client.host)
+        if session is not None:
+            try:
+                client.restore_session(**session)
+            except (TypeError, ValueError) as ex:
+                _LOGGER.debug("Ignoring invalid session of %s: %s", client.host, ex)
+        self._clients[client.host] = client
+        client.session_listener = self._async_schedule_save
+
+    @callback
+    def async_remove(self, client):
+        """Store the session of a client and stop tracking it."""
+        if self._clients.get(client.host) is not client:
+            return
+        session = client.session
+        if session is not None:
+            self._sessions[client.host] = session
+        del self._clients[client.host]
+        client.session_listener = None
+        self._async_schedule_save()
+
+
+class XiaomiACPartnerScheduleStore(_XiaomiACPartnerStore):
+    """Persist the schedules of every device by id."""
+
+    def __init__(self, hass: HomeAssistant):
+        super().__init__(hass, SCHEDULES_STORAGE_KEY)
+        self._schedules = {}
+
+    @callback
+    def _async_loaded(self, data):
+        """Take over the stored schedules."""
+        self._schedules = data.get("schedules", {})
+
+    @callback
+    def _data_to_save(self):
+        """Return the data to store."""
+        return {"schedules": self._schedules}
+
+    @callback
+    def async_get(self, device_id):
+        """Return the schedules of a device by id."""
+        return self._schedules.get(device_id, {})
+
+    @callback
+    def async_set(self, device_id, schedule_id, schedule):
+        """Store a schedule under its id."""
+        self._schedules.setdefault(device_id, {})[schedule_id] = schedule
+        self._async_schedule_save()
+
+    @callback
+    def async_delete(self, device_id, schedule_id):
+        """Remove a schedule and return True if it existed."""
+        schedules = self._schedules.get(device_id, {})
+        if schedules.pop(schedule_id, None) is None:
+            return False
+        if not schedules:
+            self._schedules.pop(device_id, None)
+        self._async_schedule_save()
+        return True
+
+    @callback
+    def async_remove_device(self, device_id):
+        """Remove all schedules of a device."""
+        if self._schedules.pop(device_id, None) is not None:
+            self._async_schedule_save()
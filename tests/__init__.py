@@ -0,0 +1 @@
+"""Tests of the Xiaomi Air Conditioning Companion component."""
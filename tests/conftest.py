@@ -0,0 +1,29 @@
+"""Fixtures of the Xiaomi Air Conditioning Companion tests."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.simulator import SimulatedACPartner
+from custom_components.xiaomi_miio_airconditioningcompanion import protocol
+
+TOKEN = "00112233445566778899aabbccddeeff"
+HOST = "127.0.0.1"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load the integration from custom_components."""
+    yield
+
+
+@pytest.fixture
+async def device(socket_enabled):
+    """Return a simulated device on the loopback address."""
+    device = SimulatedACPartner(HOST, TOKEN)
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: device, local_addr=(HOST, 0)
+    )
+    with patch.object(protocol, "MIIO_PORT", transport.get_extra_info("sockname")[1]):
+        yield device
+    transport.close()
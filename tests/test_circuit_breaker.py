@@ -0,0 +1,100 @@
+"""Tests of the circuit breaker."""
+from unittest.mock import Mock, patch
+
+import pytest
+
+from custom_components.xiaomi_miio_airconditioningcompanion import circuit_breaker
+from custom_components.xiaomi_miio_airconditioningcompanion.circuit_breaker import (
+    XiaomiACPartnerCircuitBreaker
+)
+
+
+@pytest.fixture
+def now():
+    """Patch the clock of the circuit breaker and the spread of its delays."""
+    clock = [1000.0]
+    with patch.object(circuit_breaker, "monotonic", lambda: clock[0]), patch.object(
+        circuit_breaker.random, "uniform", lambda low, high: high
+    ):
+        yield clock
+
+
+def _open(breaker, failures=3):
+    """Record failures until the circuit opens."""
+    for _ in range(failures):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_after_threshold(now):
+    """The circuit opens after the threshold of failures in a row."""
+    breaker = XiaomiACPartnerCircuitBreaker(threshold=3, open_time=30, max_open_time=300)
+    breaker.open_listener = Mock()
+
+    _open(breaker, 2)
+    breaker.record_success()
+    _open(breaker, 2)
+    assert not breaker.is_open
+
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.retry_in == 30
+    assert not breaker.allow_request()
+    breaker.open_listener.assert_called_once()
+
+
+def test_single_probe(now):
+    """Once the delay passed, a single probe is let through."""
+    breaker = XiaomiACPartnerCircuitBreaker(threshold=3, open_time=30, max_open_time=300)
+    _open(breaker)
+
+    now[0] += 30
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.retry_in is None
+    assert breaker.allow_request()
+
+
+def test_failed_probe_backs_off(now):
+    """A failed probe opens the circuit for twice the delay, up to the maximum."""
+    breaker = XiaomiACPartnerCircuitBreaker(threshold=3, open_time=30, max_open_time=100)
+    _open(breaker)
+
+    for delay in (60, 100, 100):
+        now[0] += breaker.retry_in
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.retry_in == delay
+
+
+def test_cancelled_probe(now):
+    """A probe without a result lets another one through after the maximum delay."""
+    breaker = XiaomiACPartnerCircuitBreaker(threshold=3, open_time=30, max_open_time=300)
+    _open(breaker)
+
+    now[0] += 30
+    assert breaker.allow_request()
+    now[0] += 299
+    assert not breaker.allow_request()
+    now[0] += 1
+    assert breaker.allow_request()
+
+
+def test_failures_in_flight_ignored(now):
+    """Requests sent before the circuit opened do not open it again."""
+    breaker = XiaomiACPartnerCircuitBreaker(threshold=3, open_time=30, max_open_time=300)
+    breaker.open_listener = Mock()
+    _open(breaker)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.retry_in == 30
+    breaker.open_listener.assert_called_once()
+
+    now[0] += 30
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.retry_in == 60
@@ -0,0 +1,186 @@
+"""Tests of the climate entities."""
+from unittest.mock import patch
+
+from homeassistant.components.climate import (
+    DOMAIN as CLIMATE_DOMAIN,
+    SERVICE_SET_TEMPERATURE
+)
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_TEMPERATURE, CONF_ENTITIES
+from homeassistant.components.xiaomi_miio.const import CONF_FLOW_TYPE
+from homeassistant.helpers.event import TRACK_STATE_CHANGE_CALLBACKS
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.xiaomi_miio_airconditioningcompanion import control
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    CONF_CONTROL,
+    CONF_CONTROL_MAX_COMMANDS,
+    CONF_CONTROL_MIN_INTERVAL,
+    CONF_GROUP,
+    CONF_HUMIDITY_SENSOR,
+    CONF_MAX_PARALLEL,
+    CONF_MODEL,
+    CONF_POWER_SENSOR,
+    CONF_TEMPERATURE_SENSOR,
+    CONTROL_PI,
+    DATA_COORDINATOR,
+    DATA_DEVICE,
+    DOMAIN,
+    MODEL_LUMI_ACPARTNER_V2
+)
+
+from .conftest import HOST, TOKEN
+
+ENTITY_ID = "climate.ac"
+
+
+async def _async_setup_entry(hass, device, **options):
+    """Set up a config entry of the simulated device."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="AC",
+        unique_id=device.mac,
+        options={
+            "host": HOST,
+            "token": TOKEN,
+            "mac": device.mac,
+            CONF_MODEL: MODEL_LUMI_ACPARTNER_V2,
+            **options,
+        },
+    )
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    # the air conditioner model is needed to send a configuration
+    await hass.data[DOMAIN][HOST][DATA_COORDINATOR].async_refresh()
+    await hass.async_block_till_done()
+    return entry
+
+
+async def test_set_state_sent_by_service(hass, device):
+    """The state service returns after the configuration has been sent."""
+    entry = await _async_setup_entry(hass, device)
+    device.requests.clear()
+
+    await hass.services.async_call(
+        DOMAIN,
+        "climate_set_state",
+        {ATTR_ENTITY_ID: ENTITY_ID, "hvac_mode": "cool", ATTR_TEMPERATURE: 20},
+        blocking=True,
+    )
+
+    assert device.requests == {"send_cmd": 1}
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_group_sends_to_members(hass, device):
+    """A group returns after the members sent their configuration."""
+    entry = await _async_setup_entry(hass, device)
+    group = MockConfigEntry(
+        domain=DOMAIN,
+        title="All",
+        options={CONF_FLOW_TYPE: CONF_GROUP, CONF_ENTITIES: [ENTITY_ID], CONF_MAX_PARALLEL: 1},
+    )
+    group.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(group.entry_id)
+    await hass.async_block_till_done()
+    device.requests.clear()
+
+    await hass.services.async_call(
+        CLIMATE_DOMAIN,
+        SERVICE_SET_TEMPERATURE,
+        {ATTR_ENTITY_ID: "climate.all", "hvac_mode": "cool", ATTR_TEMPERATURE: 21},
+        blocking=True,
+    )
+
+    assert device.requests == {"send_cmd": 1}
+    assert hass.states.get(ENTITY_ID).attributes[ATTR_TEMPERATURE] == 21
+    assert await hass.config_entries.async_unload(group.entry_id)
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_sensor_listeners_removed(hass, device):
+    """The sensors are no longer followed after the entry was unloaded."""
+    sensors = {
+        CONF_TEMPERATURE_SENSOR: "sensor.temperature",
+        CONF_HUMIDITY_SENSOR: "sensor.humidity",
+        CONF_POWER_SENSOR: "binary_sensor.power",
+    }
+    entry = await _async_setup_entry(hass, device, **sensors)
+    for entity_id in sensors.values():
+        assert hass.data[TRACK_STATE_CHANGE_CALLBACKS][entity_id]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    for entity_id in sensors.values():
+        assert not hass.data[TRACK_STATE_CHANGE_CALLBACKS].get(entity_id)
+
+
+async def test_pi_control_advances_on_polls(hass, device):
+    """The integral of the PI controller grows while the reading holds."""
+    now = [0.0]
+    hass.states.async_set("sensor.temperature", "25")
+    with patch.object(control, "monotonic", lambda: now[0]):
+        entry = await _async_setup_entry(
+            hass,
+            device,
+            **{
+                CONF_TEMPERATURE_SENSOR: "sensor.temperature",
+                CONF_CONTROL: CONTROL_PI,
+                CONF_CONTROL_MIN_INTERVAL: 0,
+            },
+        )
+        await hass.services.async_call(
+            DOMAIN,
+            "climate_set_state",
+            {ATTR_ENTITY_ID: ENTITY_ID, "hvac_mode": "cool", ATTR_TEMPERATURE: 24},
+            blocking=True,
+        )
+        coordinator = hass.data[DOMAIN][HOST][DATA_COORDINATOR]
+
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        assert hass.states.get(ENTITY_ID).attributes["setpoint_offset"] == -1
+
+        now[0] = 7200
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        assert hass.states.get(ENTITY_ID).attributes["setpoint_offset"] == -2
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_pi_control_failed_send_not_counted(hass, device):
+    """A shift which was not sent keeps the offset and the command budget."""
+    now = [0.0]
+    hass.states.async_set("sensor.temperature", "25")
+    with patch.object(control, "monotonic", lambda: now[0]):
+        entry = await _async_setup_entry(
+            hass,
+            device,
+            **{
+                CONF_TEMPERATURE_SENSOR: "sensor.temperature",
+                CONF_CONTROL: CONTROL_PI,
+                CONF_CONTROL_MIN_INTERVAL: 0,
+                CONF_CONTROL_MAX_COMMANDS: 1,
+            },
+        )
+        await hass.services.async_call(
+            DOMAIN,
+            "climate_set_state",
+            {ATTR_ENTITY_ID: ENTITY_ID, "hvac_mode": "cool", ATTR_TEMPERATURE: 24},
+            blocking=True,
+        )
+        coordinator = hass.data[DOMAIN][HOST][DATA_COORDINATOR]
+        acpartner = hass.data[DOMAIN][HOST][DATA_DEVICE]
+
+        # the device rejects the configuration
+        with patch.object(acpartner, "send_configuration", return_value=["error"]):
+            await coordinator.async_refresh()
+            await hass.async_block_till_done()
+        assert hass.states.get(ENTITY_ID).attributes["setpoint_offset"] == 0
+
+        device.requests.clear()
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        assert hass.states.get(ENTITY_ID).attributes["setpoint_offset"] == -1
+        assert device.requests["send_cmd"] == 1
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
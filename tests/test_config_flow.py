@@ -0,0 +1,69 @@
+"""Tests of the config and options flows."""
+from homeassistant.components.xiaomi_miio.const import CONF_FLOW_TYPE
+from homeassistant.const import CONF_ENTITIES
+from homeassistant.data_entry_flow import FlowResultType
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    CONF_GROUP,
+    CONF_HUMIDITY_SENSOR,
+    CONF_MAX_PARALLEL,
+    CONF_MODEL,
+    CONF_POWER_SENSOR,
+    CONF_POWER_WINDOWS,
+    CONF_TEMPERATURE_SENSOR,
+    DOMAIN,
+    MODEL_LUMI_ACPARTNER_V2
+)
+
+from .conftest import HOST, TOKEN
+
+
+async def _async_init_options(hass):
+    """Start the options flow of a device entry with existing sensors."""
+    for entity_id in ("sensor.temperature", "sensor.humidity", "sensor.power"):
+        hass.states.async_set(entity_id, "1")
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="AC",
+        unique_id="64:09:80:00:00:01",
+        options={
+            "host": HOST,
+            "token": TOKEN,
+            "mac": "64:09:80:00:00:01",
+            CONF_MODEL: MODEL_LUMI_ACPARTNER_V2,
+            CONF_TEMPERATURE_SENSOR: "sensor.temperature",
+            CONF_HUMIDITY_SENSOR: "sensor.humidity",
+            CONF_POWER_SENSOR: "sensor.power",
+        },
+    )
+    entry.add_to_hass(hass)
+    return await hass.config_entries.options.async_init(entry.entry_id)
+
+
+async def test_options_power_windows(hass):
+    """The windows are stored sorted."""
+    result = await _async_init_options(hass)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"scan_interval": 60, CONF_POWER_WINDOWS: "1440, 15"}
+    )
+
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_POWER_WINDOWS] == "15, 1440"
+
+
+async def test_options_group_without_members(hass):
+    """A group needs at least one member."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="All",
+        options={CONF_FLOW_TYPE: CONF_GROUP, CONF_ENTITIES: ["climate.ac"]},
+    )
+    entry.add_to_hass(hass)
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_ENTITIES: [], CONF_MAX_PARALLEL: 2}
+    )
+
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {"base": "no_device_selected"}
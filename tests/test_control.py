@@ -0,0 +1,69 @@
+"""Tests of the setpoint controller."""
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.xiaomi_miio_airconditioningcompanion import control
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    CONTROL_HYSTERESIS,
+    CONTROL_PI
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.control import (
+    XiaomiACPartnerThermostat
+)
+
+
+@pytest.fixture
+def now():
+    """Patch the clock of the controller."""
+    clock = [0.0]
+    with patch.object(control, "monotonic", lambda: clock[0]):
+        yield clock
+
+
+def test_hysteresis(now):
+    """The offset is one step outside the band and kept until the error changes its sign."""
+    thermostat = XiaomiACPartnerThermostat(CONTROL_HYSTERESIS, 0.5, 0, 10)
+
+    assert thermostat.update(24, 24.3) == 0
+    assert thermostat.update(24, 24.6) == -1
+    thermostat.record_command(-1)
+    assert thermostat.update(24, 24.2) == -1
+    assert thermostat.update(24, 23.9) == 0
+    assert thermostat.update(24, 23.4) == 1
+
+
+def test_pi(now):
+    """The integrated error grows with the elapsed time, limited to the largest offset."""
+    thermostat = XiaomiACPartnerThermostat(CONTROL_PI, 0.5, 0, 10, kp=1, ki=0.5, max_offset=3)
+
+    assert thermostat.update(24, 25) == -1
+    now[0] += 3600
+    assert thermostat.update(24, 25) == -2
+    now[0] += 3600
+    assert thermostat.update(24, 25) == -2
+    now[0] += 36000
+    assert thermostat.update(24, 25) == -3
+
+    # the windup is limited, without the limit the offset would stay at -3
+    now[0] += 60
+    assert thermostat.update(24, 23) == -2
+
+    thermostat.reset()
+    assert thermostat.update(24, 24) == 0
+
+
+def test_budget(now):
+    """Commands are spaced by the minimum interval and counted per hour."""
+    thermostat = XiaomiACPartnerThermostat(CONTROL_HYSTERESIS, 0.5, 300, 2)
+
+    assert thermostat.retry_in() == 0
+    thermostat.record_command(-1)
+    assert thermostat.retry_in() == 300
+    now[0] = 300
+    assert thermostat.retry_in() == 0
+    thermostat.record_command(0)
+    now[0] = 600
+    assert thermostat.retry_in() == 3000
+    now[0] = 3600
+    assert thermostat.retry_in() == 0
@@ -0,0 +1,65 @@
+"""Tests of the coordinator."""
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    ATTR_IS_ON,
+    ATTR_LOAD_POWER,
+    ATTR_POWER,
+    PROPERTY_STATUS
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.coordinator import (
+    XiaomiACPartnerCoordinator
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.protocol import (
+    XiaomiACPartnerClient
+)
+
+from .conftest import HOST, TOKEN
+
+
+async def _async_refresh_twice(hass, device, context):
+    """Refresh a coordinator whose only listener needs context, twice."""
+    client = XiaomiACPartnerClient(HOST, TOKEN)
+    coordinator = XiaomiACPartnerCoordinator(hass, HOST, client)
+    unsub = coordinator.async_add_listener(lambda: None, context=context)
+    await coordinator.async_refresh()
+    device.plug_state = "off"
+    device.ac_state = device.ac_state[:2] + "0" + device.ac_state[3:]
+    await coordinator.async_refresh()
+    unsub()
+    await coordinator.async_shutdown()
+    await client.async_close()
+    return coordinator
+
+
+async def test_property_subset(hass, device):
+    """Only the properties needed by all listeners are read after the first status."""
+    coordinator = await _async_refresh_twice(hass, device, (ATTR_LOAD_POWER, ATTR_POWER))
+
+    assert device.requests["get_model_and_state"] == 1
+    assert device.requests["get_prop"] == 1
+    assert coordinator.data[ATTR_POWER] == "off"
+    assert coordinator.data[ATTR_IS_ON] is False
+    assert coordinator.data[ATTR_LOAD_POWER] == 2
+
+
+async def test_property_subset_unsupported(hass, device):
+    """A device without get_prop falls back to the full status."""
+    handle = device.handle
+
+    def handle_without_get_prop(method, params):
+        if method == "get_prop":
+            raise KeyError(method)
+        return handle(method, params)
+
+    device.handle = handle_without_get_prop
+    coordinator = await _async_refresh_twice(hass, device, (ATTR_LOAD_POWER,))
+
+    assert device.requests["get_model_and_state"] == 2
+    assert device.requests["get_prop"] == 1
+    assert coordinator.data[ATTR_IS_ON] is False
+
+
+async def test_full_status(hass, device):
+    """A listener which needs the full status disables property reads."""
+    await _async_refresh_twice(hass, device, (PROPERTY_STATUS,))
+
+    assert device.requests == {"get_model_and_state": 2}
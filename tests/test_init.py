@@ -0,0 +1,63 @@
+"""Tests of the setup of config entries."""
+import asyncio
+
+from homeassistant.config_entries import ConfigEntryState
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    CONF_FIRMWARE_VERSION,
+    CONF_MODEL,
+    DATA_DEVICE,
+    DOMAIN,
+    MODEL_LUMI_ACPARTNER_V2,
+    MODEL_LUMI_ACPARTNER_V3
+)
+
+from .conftest import HOST, TOKEN
+
+
+def _create_entry(hass, device):
+    """Add a config entry of the simulated device without a model."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="AC",
+        unique_id=device.mac,
+        options={"host": HOST, "token": TOKEN, "mac": device.mac},
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+async def test_setup_without_model_unreachable(hass, device):
+    """An entry without a model is set up without waiting for the device."""
+    device.loss = 1.0
+    entry = _create_entry(hass, device)
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    assert entry.state is ConfigEntryState.LOADED
+    assert entry.options[CONF_MODEL] == MODEL_LUMI_ACPARTNER_V2
+    assert device.requests == {}
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_setup_without_model_detected(hass, device):
+    """The model detected in the background reloads the entry."""
+    device.model = MODEL_LUMI_ACPARTNER_V3
+    entry = _create_entry(hass, device)
+
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    # the device info is refreshed by a background task
+    for _ in range(100):
+        if entry.options[CONF_MODEL] != MODEL_LUMI_ACPARTNER_V2:
+            break
+        await asyncio.sleep(0.01)
+    await hass.async_block_till_done()
+
+    assert entry.state is ConfigEntryState.LOADED
+    assert entry.options[CONF_MODEL] == MODEL_LUMI_ACPARTNER_V3
+    assert entry.options[CONF_FIRMWARE_VERSION] == "1.4.4_152"
+    assert device.requests["miIO.info"] == 1
+    assert hass.data[DOMAIN][HOST][DATA_DEVICE].model == MODEL_LUMI_ACPARTNER_V3
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
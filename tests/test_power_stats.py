@@ -0,0 +1,80 @@
+"""Tests of the rolling load power statistics."""
+import random
+
+import pytest
+
+from custom_components.xiaomi_miio_airconditioningcompanion.power_stats import (
+    XiaomiACPartnerPowerStatistics,
+    parse_power_windows
+)
+
+
+def _expected(samples, seconds):
+    """Return mean, min and max of a window computed from scratch."""
+    limit = samples[-1][0] - seconds
+    kept = [sample for sample in samples if sample[0] >= limit]
+    duration = kept[-1][0] - kept[0][0]
+    if duration <= 0:
+        mean = kept[-1][1]
+    else:
+        mean = sum(
+            (kept[i + 1][0] - kept[i][0]) * (kept[i][1] + kept[i + 1][1]) / 2
+            for i in range(len(kept) - 1)
+        ) / duration
+    values = [value for _, value in kept]
+    return mean, min(values), max(values)
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 5, 16])
+def test_wraparound(capacity):
+    """The statistics match a recomputation while the buffer wraps and grows."""
+    rng = random.Random(capacity)
+    windows = [30, 120, 600]
+    statistics = XiaomiACPartnerPowerStatistics(windows, capacity)
+    samples = []
+    timestamp = 0.0
+    for _ in range(400):
+        timestamp += rng.choice([1, 5, 10, 30])
+        value = float(rng.randint(0, 1000))
+        samples.append((timestamp, value))
+        statistics.add(timestamp, value)
+
+        for seconds in windows:
+            mean, minimum, maximum = _expected(samples, seconds)
+            assert statistics.mean(seconds) == pytest.approx(mean)
+            assert statistics.minimum(seconds) == minimum
+            assert statistics.maximum(seconds) == maximum
+
+
+def test_capacity_sized_by_time():
+    """The buffer grows to the samples of the longest window and no further."""
+    statistics = XiaomiACPartnerPowerStatistics([60], 4)
+    for timestamp in range(0, 3600, 5):
+        statistics.add(timestamp, 100)
+    assert statistics.capacity == 16
+
+    # faster samples need a larger buffer for the same window
+    for timestamp in range(3600, 7200):
+        statistics.add(timestamp, 200)
+    assert statistics.capacity == 64
+    assert statistics.mean(60) == 200
+    assert statistics.minimum(60) == 200
+
+
+def test_decreasing_timestamp():
+    """A timestamp before the last sample is moved to the last timestamp."""
+    statistics = XiaomiACPartnerPowerStatistics([60], 4)
+    statistics.add(100, 10)
+    statistics.add(90, 30)
+
+    assert statistics.mean(60) == 30
+    assert statistics.maximum(60) == 30
+    assert statistics.minimum(60) == 10
+
+
+def test_parse_power_windows():
+    """Windows are deduplicated, sorted and must be positive."""
+    assert parse_power_windows("60, 15,60") == [15, 60]
+    assert parse_power_windows("") == []
+    with pytest.raises(ValueError):
+        parse_power_windows("15, 0")
@@ -0,0 +1,82 @@
+"""Tests of the miIO client."""
+import itertools
+
+from miio.airconditioningcompanion import (
+    AirConditioningCompanion,
+    FanSpeed,
+    Led,
+    OperationMode,
+    Power,
+    SwingMode
+)
+import pytest
+
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    MIIO_COMMAND_MIN_TIMEOUT
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.protocol import (
+    DEVICE_COMMAND_TEMPLATES,
+    DeviceException,
+    XiaomiACPartnerClient,
+    encode_configuration
+)
+
+from .conftest import HOST, TOKEN
+
+
+@pytest.mark.parametrize(
+    "prefix",
+    [prefix for prefix in DEVICE_COMMAND_TEMPLATES if prefix != "fallback"] + ["0180111111"],
+)
+def test_encode_configuration(prefix):
+    """The configuration commands are the ones python-miio builds."""
+    device = AirConditioningCompanion(HOST, TOKEN, model="lumi.acpartner.v2")
+    device.send_command = lambda command: command
+    model = "{}000000{}02".format(prefix[:2], prefix[2:])
+
+    for state in itertools.product(
+        [model], Power, OperationMode, range(17, 31), FanSpeed, SwingMode, Led
+    ):
+        assert encode_configuration.__wrapped__(*state) == device.send_configuration(*state)
+
+
+def _drop_replies(device):
+    """Let the simulated device handle requests without replying."""
+    device._sendto = lambda data, addr: None  # pylint: disable=protected-access
+
+
+async def test_read_retried(device):
+    """A read without reply is sent again."""
+    client = XiaomiACPartnerClient(HOST, TOKEN, timeout=0.1, retry_count=3)
+    await client.status()
+    _drop_replies(device)
+
+    with pytest.raises(DeviceException):
+        await client.status()
+    assert device.requests["get_model_and_state"] == 1 + 4
+    await client.async_close()
+
+
+async def test_command_not_retried(device):
+    """A command without reply is not sent again, it may have been executed."""
+    client = XiaomiACPartnerClient(HOST, TOKEN, timeout=1, retry_count=3)
+    await client.status()
+    _drop_replies(device)
+
+    with pytest.raises(DeviceException):
+        await client.on()
+    assert device.requests["set_power"] == 1
+    await client.async_close()
+
+
+async def test_command_timeout_floor(device):
+    """The timeout of a command stays above its floor however fast the replies are."""
+    client = XiaomiACPartnerClient(HOST, TOKEN)
+    for _ in range(20):
+        await client.status()
+        await client.on()
+
+    timeouts = client.request_timeouts
+    assert timeouts["get_model_and_state"]["timeout"] < MIIO_COMMAND_MIN_TIMEOUT
+    assert timeouts["set_power"]["timeout"] == MIIO_COMMAND_MIN_TIMEOUT
+    await client.async_close()
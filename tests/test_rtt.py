@@ -0,0 +1,54 @@
+"""Tests of the round trip time estimator."""
+import pytest
+
+from custom_components.xiaomi_miio_airconditioningcompanion.rtt import (
+    XiaomiACPartnerRttEstimator
+)
+
+
+def test_initial_timeout():
+    """Without a reply the timeout is the largest one."""
+    estimator = XiaomiACPartnerRttEstimator(min_timeout=0.1, max_timeout=5)
+
+    assert estimator.timeout == 5
+    assert estimator.as_dict() == {"srtt": None, "rttvar": None, "timeout": 5}
+
+
+def test_samples():
+    """The timeout follows the smoothed round trip time and its variance."""
+    estimator = XiaomiACPartnerRttEstimator(min_timeout=0.01, max_timeout=5)
+    estimator.add_sample(0.2)
+
+    assert estimator.srtt == pytest.approx(0.2)
+    assert estimator.rttvar == pytest.approx(0.1)
+    assert estimator.timeout == pytest.approx(0.6)
+
+    estimator.add_sample(0.6)
+    assert estimator.rttvar == pytest.approx(0.75 * 0.1 + 0.25 * 0.4)
+    assert estimator.srtt == pytest.approx(0.875 * 0.2 + 0.125 * 0.6)
+    assert estimator.timeout == pytest.approx(estimator.srtt + 4 * estimator.rttvar)
+
+
+def test_bounds():
+    """The timeout stays within its bounds."""
+    estimator = XiaomiACPartnerRttEstimator(min_timeout=0.1, max_timeout=1)
+    for _ in range(50):
+        estimator.add_sample(0.001)
+    assert estimator.timeout == 0.1
+
+    estimator.add_sample(10)
+    assert estimator.timeout == 1
+
+
+def test_backoff():
+    """A timeout doubles the timeout up to the largest one."""
+    estimator = XiaomiACPartnerRttEstimator(min_timeout=0.1, max_timeout=1)
+    for _ in range(50):
+        estimator.add_sample(0.001)
+
+    estimator.backoff()
+    assert estimator.timeout == pytest.approx(0.2)
+    estimator.backoff()
+    estimator.backoff()
+    estimator.backoff()
+    assert estimator.timeout == 1
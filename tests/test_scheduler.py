@@ -0,0 +1,45 @@
+"""Tests of the schedule firing times."""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from custom_components.xiaomi_miio_airconditioningcompanion.scheduler import (
+    next_fire_time
+)
+
+TIME_ZONE = ZoneInfo("Europe/Amsterdam")
+# a Wednesday
+NOW = datetime(2024, 5, 15, 12, 0, tzinfo=TIME_ZONE)
+
+
+def test_later_today():
+    """A schedule fires today if its time is still ahead."""
+    schedule = {"time": "18:30:00", "weekdays": ["wed"]}
+
+    assert next_fire_time(schedule, NOW) == datetime(2024, 5, 15, 16, 30, tzinfo=timezone.utc)
+
+
+def test_next_weekday():
+    """A schedule whose time passed fires on its next weekday."""
+    schedule = {"time": "07:00:00", "weekdays": ["mon", "wed"]}
+
+    assert next_fire_time(schedule, NOW) == datetime(2024, 5, 20, 5, 0, tzinfo=timezone.utc)
+
+
+def test_now_fires_next_week():
+    """A schedule at the current time fires a week later."""
+    schedule = {"time": "12:00:00", "weekdays": ["wed"]}
+
+    assert next_fire_time(schedule, NOW) == datetime(2024, 5, 22, 10, 0, tzinfo=timezone.utc)
+
+
+def test_daylight_saving_time():
+    """The local time is kept across a change of the UTC offset."""
+    schedule = {"time": "07:00:00", "weekdays": ["sun"]}
+    now = datetime(2024, 3, 30, 12, 0, tzinfo=TIME_ZONE)
+
+    assert next_fire_time(schedule, now) == datetime(2024, 3, 31, 5, 0, tzinfo=timezone.utc)
+
+
+def test_without_weekdays():
+    """A schedule without weekdays never fires."""
+    assert next_fire_time({"time": "07:00:00", "weekdays": []}, NOW) is None
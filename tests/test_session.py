@@ -0,0 +1,122 @@
+"""Tests of the persisted miIO sessions."""
+import pytest
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+
+from custom_components.xiaomi_miio_airconditioningcompanion.const import (
+    SESSION_REQUEST_ID_STEP
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.protocol import (
+    DeviceException,
+    XiaomiACPartnerClient
+)
+from custom_components.xiaomi_miio_airconditioningcompanion.storage import (
+    SESSIONS_STORAGE_KEY,
+    XiaomiACPartnerSessionStore
+)
+
+from .conftest import HOST, TOKEN
+
+
+async def test_session_saved_on_stop(hass, hass_storage, device):
+    """The latest request id of a restored session is stored when Home Assistant stops."""
+    hass_storage[SESSIONS_STORAGE_KEY] = {
+        "version": 1,
+        "key": SESSIONS_STORAGE_KEY,
+        "data": {
+            "sessions": {
+                HOST: {
+                    "device_id": device.device_id.hex(),
+                    "stamp_offset": 0,
+                    "request_id": 500,
+                },
+            },
+        },
+    }
+    store = XiaomiACPartnerSessionStore(hass)
+    await store.async_load()
+    client = XiaomiACPartnerClient(HOST, TOKEN)
+    store.async_restore(client)
+    await client.status()
+    await client.status()
+    request_id = client.session["request_id"]
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+    await hass.async_stop(force=True)
+    await client.async_close()
+
+    session = hass_storage[SESSIONS_STORAGE_KEY]["data"]["sessions"][HOST]
+    assert session["device_id"] == device.device_id.hex()
+    assert session["request_id"] == request_id
+
+
+async def test_restored_session_skips_request_ids(hass, device):
+    """A restored session continues a step after the stored request id."""
+    client = XiaomiACPartnerClient(HOST, TOKEN)
+    client.restore_session(device.device_id.hex(), 0, request_id=500)
+
+    assert client.session["request_id"] == 500 + SESSION_REQUEST_ID_STEP
+    await client.status()
+    assert client.session["request_id"] == 501 + SESSION_REQUEST_ID_STEP
+    await client.async_close()
+
+
+async def test_session_kept_on_timeout(hass, device):
+    """A request without reply does not start a new session."""
+    client = XiaomiACPartnerClient(HOST, TOKEN, timeout=0.1, retry_count=0)
+    await client.status()
+    session = client.session
+
+    device.loss = 1.0
+    with pytest.raises(DeviceException):
+        await client.status()
+    assert client.session["device_id"] == session["device_id"]
+    await client.async_close()
+
+
+async def test_stale_session_discovered_again(hass, hass_storage, device):
+    """A restored session the device ignores is replaced by a handshake."""
+    hass_storage[SESSIONS_STORAGE_KEY] = {
+        "version": 1,
+        "key": SESSIONS_STORAGE_KEY,
+        "data": {
+            "sessions": {
+                HOST: {"device_id": "deadbeef", "stamp_offset": 0, "request_id": 500},
+            },
+        },
+    }
+    store = XiaomiACPartnerSessionStore(hass)
+    await store.async_load()
+    client = XiaomiACPartnerClient(HOST, TOKEN, timeout=0.1, retry_count=1)
+    store.async_restore(client)
+
+    with pytest.raises(DeviceException):
+        await client.status()
+    assert client.session is None
+    assert device.requests == {}
+
+    await client.status()
+    assert client.session["device_id"] == device.device_id.hex()
+    assert device.requests == {"get_model_and_state": 1}
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+    await hass.async_stop(force=True)
+    await client.async_close()
+
+    session = hass_storage[SESSIONS_STORAGE_KEY]["data"]["sessions"][HOST]
+    assert session["device_id"] == device.device_id.hex()
+
+
+async def test_session_discovered_after_second_timeout(hass, device):
+    """A session left without reply by two requests is discovered again."""
+    client = XiaomiACPartnerClient(HOST, TOKEN, timeout=0.1, retry_count=0)
+    await client.status()
+
+    device.loss = 1.0
+    for _ in range(2):
+        with pytest.raises(DeviceException):
+            await client.status()
+    assert client.session is None
+    await client.async_close()